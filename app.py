@@ -6,15 +6,17 @@ Uses the Application Factory pattern for modularity and testing.
 
 from flask import Flask, render_template, redirect, url_for, flash, request
 from config import config
-from extensions import db, migrate, login_manager, bcrypt
+from extensions import db, migrate, login_manager, bcrypt, orjson, orjson_dumps, ORJSONProvider
 
 
-def create_app(config_name='development'):
+def create_app(config_name='development', with_migrations=True):
     """
     Application Factory Function
     
     Args:
         config_name (str): Configuration to use ('development', 'production', 'testing')
+        with_migrations (bool): Register Flask-Migrate (the `flask db` commands).
+            Standalone scripts pass False to skip importing Alembic.
     
     Returns:
         Flask: Configured Flask application instance
@@ -25,9 +27,20 @@ def create_app(config_name='development'):
     # Load configuration from config.py based on environment
     app.config.from_object(config[config_name])
     
+    # Use orjson for JSON responses/requests when it is installed,
+    # and for the native JSON columns (component_scores, grading_formula, ...)
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+            'json_serializer': orjson_dumps,
+            'json_deserializer': orjson.loads,
+        }
+    
     # Initialize extensions with the app
     db.init_app(app)
-    migrate.init_app(app, db)
+    if with_migrations:
+        migrate.init_app(app, db)
     login_manager.init_app(app)
     bcrypt.init_app(app)
     
@@ -49,6 +62,9 @@ def create_app(config_name='development'):
     # Register error handlers
     register_error_handlers(app)
     
+    # Register CLI commands
+    register_commands(app)
+    
     # Import models so Flask-Migrate can detect them
     with app.app_context():
         # Import all models here
@@ -140,6 +156,18 @@ def register_error_handlers(app):
         return render_template('errors/403.html'), 403
 
 
+def register_commands(app):
+    """
+    Register custom `flask` CLI commands
+    """
+    @app.cli.command('recount-enrollments')
+    def recount_enrollments():
+        """Rebuild Class.enrolled_count from the enrollment table (run nightly)"""
+        from models import Class
+        Class.recount_enrollments()
+        print('Enrollment counts recomputed.')
+
+
 # Run the application
 if __name__ == '__main__':
     # Create app instance (always use development config)
@@ -136,10 +136,11 @@ def register_student():
             role='student'
         )
         db.session.add(user)
-        db.session.flush()
         
+        # Linked through the relationship - the flush at commit inserts the
+        # user first and fills in user_id, so no separate flush is needed
         student = Student(
-            user_id=user.id,
+            user=user,
             student_number=student_number,
             first_name=first_name,
             last_name=last_name,
@@ -206,10 +207,10 @@ def register_teacher():
             role='teacher'
         )
         db.session.add(user)
-        db.session.flush()
         
+        # Linked through the relationship (user_id is set at commit)
         teacher = Teacher(
-            user_id=user.id,
+            user=user,
             employee_number=employee_number,
             first_name=first_name,
             last_name=last_name,
@@ -706,8 +707,10 @@ def settings():
                 return redirect(url_for('admin.settings'))
             
             # Save to database
-            SystemSettings.set_setting('current_school_year', school_year, current_user.email)
-            SystemSettings.set_setting('current_semester', semester, current_user.email)
+            SystemSettings.set_settings_bulk({
+                'current_school_year': school_year,
+                'current_semester': semester
+            }, current_user.email)
             
             flash(f'✅ Academic year updated to {school_year}, {semester}', 'success')
             return redirect(url_for('admin.settings'))
@@ -726,11 +729,18 @@ def settings():
     current_year = Config.get_current_school_year()
     current_semester = Config.get_current_semester()
     
-    # Check if values are from database (manual) or auto-calculated
-    db_year = SystemSettings.get_setting('current_school_year')
-    db_semester = SystemSettings.get_setting('current_semester')
+    # Check if values are from database (manual) or auto-calculated -
+    # both rows come back in one query and are reused for the
+    # last-updated info below
+    db_settings = {
+        setting.setting_key: setting
+        for setting in SystemSettings.query.filter(
+            SystemSettings.setting_key.in_(['current_school_year', 'current_semester'])
+        )
+    }
+    year_setting = db_settings.get('current_school_year')
     
-    is_manual = db_year is not None and db_semester is not None
+    is_manual = year_setting is not None and 'current_semester' in db_settings
     
     # Get auto-calculated values for comparison
     auto_year = Config._auto_calculate_school_year()
@@ -740,10 +750,8 @@ def settings():
     last_updated = None
     updated_by = None
     if is_manual:
-        year_setting = SystemSettings.query.filter_by(setting_key='current_school_year').first()
-        if year_setting:
-            last_updated = year_setting.updated_at
-            updated_by = year_setting.updated_by
+        last_updated = year_setting.updated_at
+        updated_by = year_setting.updated_by
     
     return render_template(
         'admin/settings.html',
@@ -180,11 +180,10 @@ def create_test_users():
             role='teacher'
         )
         db.session.add(teacher_user)
-        db.session.flush()  # Get teacher_user.id
         
-        # Create Teacher Profile
+        # Create Teacher Profile (linked via relationship; ids assigned at commit)
         teacher_profile = Teacher(
-            user_id=teacher_user.id,
+            user=teacher_user,
             employee_number='EMP-2024-001',
             first_name='Maria',
             last_name='Santos',
@@ -200,11 +199,10 @@ def create_test_users():
             role='student'
         )
         db.session.add(student_user)
-        db.session.flush()  # Get student_user.id
         
-        # Create Student Profile
+        # Create Student Profile (linked via relationship; ids assigned at commit)
         student_profile = Student(
-            user_id=student_user.id,
+            user=student_user,
             student_number='2024-00001',
             first_name='Juan',
             last_name='Dela Cruz',
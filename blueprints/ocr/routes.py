@@ -21,6 +21,7 @@ from flask import (
 )
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy.orm import selectinload
 
 from extensions import db
 from models import Teacher, Class, Enrollment, Student, Test, Grade, TestPaperImage
@@ -191,13 +192,7 @@ def _write_grade_from_ocr(img_record, student_id, teacher_id):
     max_score = float(match.group(2))
     if max_score <= 0:
         return False
-    grade = Grade.query.filter_by(
-        test_id=img_record.test_id, student_id=student_id
-    ).first()
-    if not grade:
-        grade = Grade(test_id=img_record.test_id,
-                      student_id=student_id, graded_by=teacher_id)
-        db.session.add(grade)
+    grade = Grade.get_or_create(img_record.test_id, student_id, graded_by=teacher_id)
     grade.raw_score  = raw_score
     grade.max_score  = max_score
     grade.graded_by  = teacher_id
@@ -266,7 +261,9 @@ def ai_grading():
     teacher = current_user.teacher_profile
  
     # Get teacher's classes
+    # Template lists every class's tests - load them in one query
     teacher_classes = Class.query.filter_by(teacher_id=teacher.id)\
+        .options(selectinload(Class.tests))\
         .order_by(Class.school_year.desc(), Class.semester)\
         .all()
  
@@ -532,6 +529,9 @@ def confirm_assignment():
 
     grade_written = _write_grade_from_ocr(img, student_id, teacher.id)
     db.session.commit()
+    if grade_written:
+        from blueprints.teacher.routes import _invalidate_analytics_cache
+        _invalidate_analytics_cache(teacher.id)
 
     student = Student.query.get(student_id)
     return jsonify({
@@ -593,6 +593,9 @@ def confirm_batch():
             skipped += 1
 
     db.session.commit()
+    if confirmed:
+        from blueprints.teacher.routes import _invalidate_analytics_cache
+        _invalidate_analytics_cache(teacher.id)
     return jsonify({'success': True, 'confirmed': confirmed,
                     'skipped': skipped, 'errors': errors})
 
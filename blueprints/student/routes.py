@@ -8,6 +8,7 @@ from flask_login import login_required, current_user
 from models import Student, Class, Enrollment, Grade, Test, TestPaperImage
 from extensions import db, bcrypt
 from config import Config
+from sqlalchemy.orm import contains_eager
 
 # Initialize the blueprint for student-related routes
 student_bp = Blueprint('student', __name__)
@@ -79,10 +80,12 @@ def dashboard():
     enrollment_map = {e.class_id: e for e in enrollments}
 
     # --- Recent grades (global, not filtered by semester) ---
+    # The template shows grade.test.class_, so fill both from the join
     recent_grades = Grade.query.filter_by(student_id=student.id)\
         .filter(Grade.final_grade.isnot(None))\
         .join(Test)\
         .join(Class)\
+        .options(contains_eager(Grade.test).contains_eager(Test.class_))\
         .order_by(Grade.graded_at.desc())\
         .limit(5)\
         .all()
@@ -5,13 +5,17 @@ This version fixes the routing errors while preserving all existing functionalit
 """
 
 import json
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+import threading
+import time
+import numpy as np
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from models import Teacher, Class, Enrollment, Student, Subject, Grade, Test
+from models import Teacher, Class, Enrollment, Student, Subject, Grade, Test, formula_weight_total
 from extensions import db, bcrypt
 from config import Config
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy import func, and_, case
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from datetime import datetime
 from config import Config
 
 # Initialize the blueprint for teacher-related routes
@@ -148,7 +152,7 @@ def _update_enrollment_average(student_id, class_id):
     Recompute enrollment.final_grade as the average of all
     completed term grades for this student in this class.
     Only terms with a real PH grade (not INC) count.
-    Commits to DB.
+    Flushes only - the caller commits along with the grade change.
     """
     from models import Enrollment, Test
  
@@ -187,9 +191,71 @@ def _update_enrollment_average(student_id, class_id):
             )
         else:
             enrollment.final_grade = None
-        db.session.commit()
+        db.session.flush()
  
 
+# Per-process cache of the analytics page numbers:
+#   {(teacher_id, school_year, semester): (expires_at, analytics_data)}
+# Entries live for ANALYTICS_CACHE_TTL seconds and are dropped by every route
+# that changes classes, tests, rosters or grades - always after its commit,
+# so a concurrent request can't re-cache the pre-commit numbers. Only this
+# worker's copy is dropped; other workers may serve stale numbers until the
+# TTL runs out (see Config.ANALYTICS_CACHE_TTL). Every access holds
+# _analytics_lock, since request threads read and write it concurrently.
+_analytics_cache = {}
+_analytics_lock = threading.Lock()
+
+
+def _get_cached_analytics(cache_key):
+    """Cached analytics data for the key, or None if missing/expired"""
+    with _analytics_lock:
+        cached = _analytics_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def _store_analytics(cache_key, analytics_data, ttl):
+    """Cache analytics data for ttl seconds, dropping expired entries"""
+    now = time.monotonic()
+    with _analytics_lock:
+        for key in [k for k, (expires_at, _) in _analytics_cache.items() if expires_at <= now]:
+            del _analytics_cache[key]
+        _analytics_cache[cache_key] = (now + ttl, analytics_data)
+
+
+def _invalidate_analytics_cache(teacher_id):
+    """Drop cached analytics for a teacher (all semesters)"""
+    with _analytics_lock:
+        for key in [k for k in _analytics_cache if k[0] == teacher_id]:
+            del _analytics_cache[key]
+
+
+def _teacher_grades_q(teacher_id, *entities):
+    """
+    Grades on tests in this teacher's classes (Grade -> Test -> Class).
+    Pass column entities to select those instead of Grade rows.
+    """
+    query = db.session.query(*entities) if entities else Grade.query
+    return query.select_from(Grade).join(Test).join(Class).filter(
+        Class.teacher_id == teacher_id
+    )
+
+
+def _count_enrolled_students(teacher_id, school_year, semester):
+    """
+    Distinct students enrolled in a teacher's classes for one semester.
+    COUNT(DISTINCT) runs in the database - no enrollment rows are fetched.
+    """
+    return db.session.query(func.count(func.distinct(Enrollment.student_id)))\
+        .join(Class).filter(
+            Class.teacher_id == teacher_id,
+            Class.school_year == school_year,
+            Class.semester == semester,
+            Enrollment.status == 'enrolled'
+        ).scalar() or 0
+
+
 # Decorator to check if current user is a teacher
 def teacher_required(f):
     """
@@ -251,13 +317,7 @@ def dashboard():
     classes = query.all()
     
     # ✅ Calculate total students for FILTERED classes
-    total_students = db.session.query(func.count(func.distinct(Enrollment.student_id)))\
-        .join(Class).filter(
-            Class.teacher_id == teacher.id,
-            Class.school_year == selected_year,
-            Class.semester == selected_semester,
-            Enrollment.status == 'enrolled'
-        ).scalar() or 0
+    total_students = _count_enrolled_students(teacher.id, selected_year, selected_semester)
     
     # Calculate weekly schedule for FILTERED classes
     weekly_schedule = {
@@ -284,19 +344,13 @@ def dashboard():
     # Get classes with stats for FILTERED classes
     classes_with_stats = []
     for cls in classes:
-        student_count = Enrollment.query.filter_by(
-            class_id=cls.id,
-            status='enrolled'
-        ).count()
+        student_count = cls.get_enrolled_count()
         
         tests = Test.query.filter_by(class_id=cls.id).all()
         ungraded_count = 0
         
         for test in tests:
-            enrolled_students = Enrollment.query.filter_by(
-                class_id=cls.id,
-                status='enrolled'
-            ).count()
+            enrolled_students = student_count
             
             graded_students = Grade.query.filter_by(
                 test_id=test.id
@@ -357,38 +411,43 @@ def classes():
     if selected_semester != 'all':
         query = query.filter_by(semester=selected_semester)
     
-    # Execute query
-    teacher_classes = query.order_by(
+    # Execute query - every class's tests are shown, so load them in one go
+    teacher_classes = query.options(selectinload(Class.tests)).order_by(
         Class.school_year.desc(),
         Class.semester
     ).all()
     
     # Build available years list for dropdown
     all_years = sorted(
-        list(set([cls.school_year for cls in Class.query.filter_by(teacher_id=teacher.id).all()])),
+        (year for (year,) in db.session.query(Class.school_year)
+            .filter_by(teacher_id=teacher.id).distinct()),
         reverse=True
     )
     available_years = all_years  # Show all years with classes
     
+    # Graded rows per class, one grouped query for the whole page
+    graded_counts = dict(
+        db.session.query(Test.class_id, func.count(Grade.id))
+        .join(Grade, Grade.test_id == Test.id)
+        .filter(
+            Test.class_id.in_([cls.id for cls in teacher_classes]),
+            Grade.final_grade.isnot(None)
+        )
+        .group_by(Test.class_id)
+        .all()
+    ) if teacher_classes else {}
+    
     # Get class details with enrollment info and grading progress
     classes_data = []
     for cls in teacher_classes:
-        enrollment_count = Enrollment.query.filter_by(
-            class_id=cls.id,
-            status='enrolled'
-        ).count()
+        enrollment_count = cls.get_enrolled_count()
         
         # Calculate grading completion percentage
-        tests = Test.query.filter_by(class_id=cls.id).all()
+        tests = cls.tests
         total_possible_grades = enrollment_count * len(tests) if tests else 0
+        graded_count = graded_counts.get(cls.id, 0)
         
         if total_possible_grades > 0:
-            graded_count = 0
-            for test in tests:
-                graded_count += Grade.query.filter_by(
-                    test_id=test.id
-                ).filter(Grade.final_grade.isnot(None)).count()
-            
             grading_percentage = (graded_count / total_possible_grades * 100)
         else:
             grading_percentage = 0
@@ -406,7 +465,8 @@ def classes():
             'school_year': cls.school_year,
             'max_students': cls.max_students,
             'has_formula': cls.has_grading_formula(),
-            'can_edit_formula': cls.can_edit_formula()
+            # Same as cls.can_edit_formula(), from the counts above
+            'can_edit_formula': graded_count == 0
         }
         
         classes_data.append({
@@ -497,7 +557,7 @@ def create_class():
                 raise ValueError("At least one component is required")
             
             # Validate weights total 100%
-            total_weight = sum(c.get('weight', 0) for c in formula['components'])
+            total_weight = formula_weight_total(formula['components'])
             if total_weight != 100:
                 raise ValueError(f"Component weights must total 100%, got {total_weight}%")
             
@@ -533,7 +593,7 @@ def create_class():
             max_students=max_students,
             
             # Grading formula (NEW)
-            grading_formula=grading_formula_json
+            grading_formula=formula
         )
         
         db.session.add(new_class)
@@ -552,6 +612,7 @@ def create_class():
                 db.session.add(enrollment)
         
         db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
         
         # Success message
         display_name = f"{subject_code} - {subject_name}" if subject_code else subject_name
@@ -592,6 +653,7 @@ def delete_class():
         # Delete the class (cascades to enrollments, tests, and grades)
         db.session.delete(cls)
         db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
         
         flash(f'Class "{class_name}" deleted successfully.', 'success')
         
@@ -707,6 +769,7 @@ def update_formula(class_id):
         # Validate and set formula
         cls.set_grading_formula(formula_json)
         db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
         
         return jsonify({
             'success': True,
@@ -776,10 +839,7 @@ def get_class_edit_data(class_id):
     ).first_or_404()
     
     # Check enrollment count
-    enrollment_count = Enrollment.query.filter_by(
-        class_id=class_id,
-        status='enrolled'
-    ).count()
+    enrollment_count = cls.get_enrolled_count()
     
     # Check if any grades exist
     has_grades = Grade.query.join(Test).filter(
@@ -850,10 +910,7 @@ def update_class(class_id):
             return redirect(url_for('teacher.classes'))
         
         # Check enrollment capacity
-        enrollment_count = Enrollment.query.filter_by(
-            class_id=class_id,
-            status='enrolled'
-        ).count()
+        enrollment_count = cls.get_enrolled_count()
         
         if max_students and max_students < enrollment_count:
             flash(f'Cannot reduce capacity below current enrollment ({enrollment_count} students).', 'error')
@@ -882,7 +939,7 @@ def update_class(class_id):
                 if len(formula['components']) < 1:
                     raise ValueError("At least one component is required")
                 
-                total_weight = sum(c.get('weight', 0) for c in formula['components'])
+                total_weight = formula_weight_total(formula['components'])
                 if total_weight != 100:
                     raise ValueError(f"Component weights must total 100%, got {total_weight}%")
                 
@@ -892,8 +949,10 @@ def update_class(class_id):
                     if comp.get('weight', 0) < 0 or comp.get('weight', 0) > 100:
                         raise ValueError("Component weights must be between 0 and 100")
                 
-                # Set formula
-                cls.grading_formula = formula_json
+                # Set formula (and re-run it over any component scores)
+                if formula != cls.grading_formula:
+                    cls.grading_formula = formula
+                    cls.recalculate_grades()
                 
             except json.JSONDecodeError:
                 flash('Invalid grading formula format.', 'error')
@@ -903,12 +962,15 @@ def update_class(class_id):
                 return redirect(url_for('teacher.classes'))
         
         # ✅ NEW: Update student roster
-        # Get currently enrolled students
-        current_enrollments = Enrollment.query.filter_by(
-            class_id=class_id,
-            status='enrolled'
-        ).all()
-        current_student_ids = set(e.student_id for e in current_enrollments)
+        # All enrollment rows for this class (one per student - see
+        # uq_enrollment_student_class), including dropped ones
+        enrollments_by_student = {
+            e.student_id: e
+            for e in Enrollment.query.filter_by(class_id=class_id).all()
+        }
+        current_student_ids = set(
+            sid for sid, e in enrollments_by_student.items() if e.status == 'enrolled'
+        )
         
         # Find students to add (in new list but not in current)
         students_to_add = new_student_ids - current_student_ids
@@ -917,10 +979,17 @@ def update_class(class_id):
         students_to_remove = current_student_ids - new_student_ids
         
         # Add new students
-        for student_id in students_to_add:
-            # Check if student exists
-            student = Student.query.get(student_id)
-            if student:
+        existing_student_ids = set()
+        if students_to_add:
+            existing_student_ids = set(
+                sid for (sid,) in db.session.query(Student.id).filter(Student.id.in_(students_to_add))
+            )
+        for student_id in students_to_add & existing_student_ids:
+            enrollment = enrollments_by_student.get(student_id)
+            if enrollment:
+                # Re-adding a dropped student reactivates their old row
+                enrollment.status = 'enrolled'
+            else:
                 enrollment = Enrollment(
                     student_id=student_id,
                     class_id=class_id,
@@ -930,11 +999,7 @@ def update_class(class_id):
         
         # Remove students (set status to 'dropped' instead of deleting)
         for student_id in students_to_remove:
-            enrollment = Enrollment.query.filter_by(
-                class_id=class_id,
-                student_id=student_id,
-                status='enrolled'
-            ).first()
+            enrollment = enrollments_by_student[student_id]
             if enrollment:
                 # Check if student has any grades in this class
                 has_grades = Grade.query.join(Test).filter(
@@ -951,6 +1016,7 @@ def update_class(class_id):
                     db.session.delete(enrollment)
         
         db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
         
         display_name = f"{cls.effective_subject_code} - {cls.effective_subject_name}"
         flash(f'Class "{display_name}" updated successfully!', 'success')
@@ -1128,15 +1194,7 @@ def update_grade():
         Class.teacher_id == teacher.id
     ).first_or_404()
  
-    grade = Grade.query.filter_by(
-        test_id=test_id, student_id=student_id
-    ).first()
- 
-    if not grade:
-        grade = Grade(
-            test_id=test_id, student_id=student_id, graded_by=teacher.id
-        )
-        db.session.add(grade)
+    grade = Grade.get_or_create(test_id, student_id, graded_by=teacher.id)
  
     grade.graded_by = teacher.id
     grade.graded_at = datetime.utcnow()
@@ -1161,18 +1219,20 @@ def update_grade():
         # The PH grade lives on the synthetic term Grade record (see below)
         grade.final_grade = grade.calculated_percentage
  
-        db.session.commit()
- 
         # Recalculate the term grade for this student
+        # (the pending grade is autoflushed, so it is included)
         term_result = recalculate_term_grade(
             student_id=student_id,
             class_id=test.class_id,
             term_tag=test.term_tag,
-            teacher_id=teacher.id
+            teacher_id=teacher.id,
+            commit=False
         )
  
-        # Update enrollment average
+        # Update enrollment average, then commit everything once
         _update_enrollment_average(student_id, test.class_id)
+        db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
  
         return jsonify({
             'success':            True,
@@ -1192,9 +1252,10 @@ def update_grade():
  
         grade.final_grade      = grade_value
         grade.calculated_grade = grade_value
-        db.session.commit()
  
         _update_enrollment_average(student_id, test.class_id)
+        db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
  
         return jsonify({'success': True, 'grade': grade_value})
 
@@ -1261,6 +1322,7 @@ def create_test():
  
         db.session.add(new_test)
         db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
  
         tag_info = f" [{term_tag} / {component_tag}]" if term_tag else ""
         flash(f'Test "{title}"{tag_info} created successfully!', 'success')
@@ -1299,6 +1361,7 @@ def delete_test():
         # Delete test (cascades to grades)
         db.session.delete(test)
         db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
         
         flash(f'Test "{test_title}" deleted successfully.', 'success')
         return redirect(url_for('teacher.grading', class_id=class_id))
@@ -1310,129 +1373,97 @@ def delete_test():
 
 
 # FIX FOR ERROR: "'dict object' has no attribute 'overall_average'"
-@teacher_bp.route('/analytics')
-@teacher_required
-def analytics():
+def _compute_analytics(teacher_id, classes, current_school_year, current_semester):
     """
-    Renders the Analytics page with comprehensive statistics.
-    FIX: Added 'overall_average' key to analytics_data dictionary
+    Build the analytics numbers for a teacher's classes this semester.
+    Returns plain data only (class_performance refers to classes by id)
+    so the result can be cached across requests.
     """
-    teacher = current_user.teacher_profile
-    
-    current_school_year = Config.get_current_school_year()
-    current_semester = Config.get_current_semester()
-    
-    # Get all classes for this semester
-    classes = Class.query.filter_by(
-        teacher_id=teacher.id,
-        school_year=current_school_year,
-        semester=current_semester
-    ).all()
-    
     # Calculate total students
-    total_students = db.session.query(func.count(func.distinct(Enrollment.student_id)))\
-        .join(Class).filter(
-            Class.teacher_id == teacher.id,
-            Class.school_year == current_school_year,
-            Class.semester == current_semester,
-            Enrollment.status == 'enrolled'
-        ).scalar() or 0
+    total_students = _count_enrolled_students(teacher_id, current_school_year, current_semester)
     
     # Calculate new students this semester
     new_students = max(0, total_students - 120)  # Placeholder logic
     
-    # Get all grades for this semester
-    all_grades = Grade.query.join(Test).join(Class).filter(
-        Class.teacher_id == teacher.id,
-        Class.school_year == current_school_year,
-        Class.semester == current_semester,
-        Grade.final_grade.isnot(None)
-    ).all()
+    # Get all grades for this semester (final_grade column only, no ORM rows)
+    all_grades = np.fromiter(
+        (g for g, in _teacher_grades_q(teacher_id, Grade.final_grade).filter(
+            Class.school_year == current_school_year,
+            Class.semester == current_semester,
+            Grade.final_grade.isnot(None)
+        )),
+        dtype=np.float64
+    )
     
     # Calculate average grade
-    if all_grades:
-        avg_class_grade = sum(g.final_grade for g in all_grades) / len(all_grades)
+    if all_grades.size:
+        avg_class_grade = float(all_grades.mean())
     else:
         avg_class_grade = 0.0
     
     # Calculate passing rate
-    graded_students = len(all_grades)
-    passed_students = sum(1 for g in all_grades if g.final_grade <= 3.0)
+    graded_students = int(all_grades.size)
+    passed_students = int(np.count_nonzero(all_grades <= 3.0))
     passing_rate = round((passed_students / graded_students * 100) if graded_students > 0 else 0)
     
     # Grade distribution
-    grade_distribution = {
-        '1.0-1.5': 0,
-        '1.75-2.0': 0,
-        '2.25-2.5': 0,
-        '2.75-3.0': 0,
-        '4.0-5.0': 0
-    }
-    
-    for grade in all_grades:
-        g = grade.final_grade
-        if 1.0 <= g <= 1.5:
-            grade_distribution['1.0-1.5'] += 1
-        elif 1.75 <= g <= 2.0:
-            grade_distribution['1.75-2.0'] += 1
-        elif 2.25 <= g <= 2.5:
-            grade_distribution['2.25-2.5'] += 1
-        elif 2.75 <= g <= 3.0:
-            grade_distribution['2.75-3.0'] += 1
-        else:
-            grade_distribution['4.0-5.0'] += 1
+    # The ranges are disjoint; anything outside them (gaps such as 1.6
+    # included) lands in '4.0-5.0', same as the original if/elif chain
+    grade_distribution = {}
+    for label, lo, hi in (('1.0-1.5', 1.0, 1.5),
+                          ('1.75-2.0', 1.75, 2.0),
+                          ('2.25-2.5', 2.25, 2.5),
+                          ('2.75-3.0', 2.75, 3.0)):
+        grade_distribution[label] = int(np.count_nonzero((all_grades >= lo) & (all_grades <= hi)))
+    grade_distribution['4.0-5.0'] = graded_students - sum(grade_distribution.values())
+    
+    # Per-class aggregates in two grouped queries instead of 5 per class
+    class_ids = [cls.id for cls in classes]
+    enrolled_counts = {}
+    test_stats = {}
+    if class_ids:
+        enrolled_counts = dict(
+            db.session.query(Enrollment.class_id, func.count(Enrollment.id))
+            .filter(Enrollment.class_id.in_(class_ids), Enrollment.status == 'enrolled')
+            .group_by(Enrollment.class_id)
+            .all()
+        )
+        # Tests outer-joined to grades: test count, graded count and
+        # average final grade per class in one pass (AVG skips NULLs)
+        for class_id, test_count, graded, avg_grade in db.session.query(
+            Test.class_id,
+            func.count(func.distinct(Test.id)),
+            func.sum(case((Grade.final_grade.isnot(None), 1), else_=0)),
+            func.avg(Grade.final_grade)
+        ).outerjoin(Grade, Grade.test_id == Test.id)\
+                .filter(Test.class_id.in_(class_ids))\
+                .group_by(Test.class_id):
+            test_stats[class_id] = (
+                test_count,
+                int(graded or 0),
+                float(avg_grade) if avg_grade is not None else None
+            )
     
     # Class performance breakdown
     class_performance = []
     for cls in classes:
-        enrollments = Enrollment.query.filter_by(
-            class_id=cls.id,
-            status='enrolled'
-        ).all()
-        
-        student_count = len(enrollments)
-        
-        # Get average grade for this class
-        class_grades = Grade.query.join(Test).filter(
-            Test.class_id == cls.id,
-            Grade.final_grade.isnot(None)
-        ).all()
-        
-        if class_grades:
-            avg_grade = sum(g.final_grade for g in class_grades) / len(class_grades)
-        else:
-            avg_grade = None
-        
         class_performance.append({
-            'class': cls,
-            'student_count': student_count,
-            'avg_grade': avg_grade
+            'class_id': cls.id,
+            'student_count': enrolled_counts.get(cls.id, 0),
+            'avg_grade': test_stats.get(cls.id, (0, 0, None))[2]
         })
     
     # Total tests
-    total_tests = Test.query.join(Class).filter(
-        Class.teacher_id == teacher.id,
-        Class.school_year == current_school_year,
-        Class.semester == current_semester
-    ).count()
+    total_tests = sum(stats[0] for stats in test_stats.values())
     
     # Grading completion
     total_gradable = 0
     graded_count = 0
     
     for cls in classes:
-        enrollment_count = Enrollment.query.filter_by(
-            class_id=cls.id,
-            status='enrolled'
-        ).count()
-        
-        test_count = Test.query.filter_by(class_id=cls.id).count()
-        total_gradable += enrollment_count * test_count
-        
-        graded_count += Grade.query.join(Test).filter(
-            Test.class_id == cls.id,
-            Grade.final_grade.isnot(None)
-        ).count()
+        test_count, graded, _ = test_stats.get(cls.id, (0, 0, None))
+        total_gradable += enrolled_counts.get(cls.id, 0) * test_count
+        graded_count += graded
     
     completion_rate = round((graded_count / total_gradable * 100) if total_gradable > 0 else 0)
     ungraded_count = total_gradable - graded_count
@@ -1441,7 +1472,7 @@ def analytics():
     total_units = sum(cls.units for cls in classes)
     
     # FIX: Added 'overall_average' key - this was causing the error
-    analytics_data = {
+    return {
         'total_students': total_students,
         'new_students': new_students,
         'avg_class_grade': avg_class_grade,
@@ -1461,6 +1492,46 @@ def analytics():
         'total_classes': len(classes),
         'total_units': total_units
     }
+
+
+@teacher_bp.route('/analytics')
+@teacher_required
+def analytics():
+    """
+    Renders the Analytics page with comprehensive statistics.
+    FIX: Added 'overall_average' key to analytics_data dictionary
+    Statistics are cached per teacher/semester for ANALYTICS_CACHE_TTL seconds.
+    """
+    teacher = current_user.teacher_profile
+    
+    current_school_year = Config.get_current_school_year()
+    current_semester = Config.get_current_semester()
+    
+    # Get all classes for this semester
+    classes = Class.query.filter_by(
+        teacher_id=teacher.id,
+        school_year=current_school_year,
+        semester=current_semester
+    ).all()
+    
+    cache_key = (teacher.id, current_school_year, current_semester)
+    analytics_data = _get_cached_analytics(cache_key)
+    if analytics_data is None:
+        analytics_data = _compute_analytics(
+            teacher.id, classes, current_school_year, current_semester
+        )
+        ttl = current_app.config.get('ANALYTICS_CACHE_TTL', 60)
+        if ttl > 0:
+            _store_analytics(cache_key, analytics_data, ttl)
+    
+    # Re-attach this request's Class objects to the cached per-class rows
+    classes_by_id = {cls.id: cls for cls in classes}
+    analytics_data = dict(analytics_data)
+    analytics_data['class_performance'] = [
+        dict(row, **{'class': classes_by_id[row['class_id']]})
+        for row in analytics_data['class_performance']
+        if row['class_id'] in classes_by_id
+    ]
     
     return render_template(
         'teacher/analytics.html',
@@ -1481,20 +1552,25 @@ def profile():
     """
     teacher = current_user.teacher_profile
     
+    csy = Config.get_current_school_year()
+    csem = Config.get_current_semester()
+    
     # Get teaching stats
-    total_classes = Class.query.filter_by(teacher_id=teacher.id).count()
-
-    current_students = db.session.query(func.count(func.distinct(Enrollment.student_id)))\
-        .join(Class).filter(
-            Class.teacher_id == teacher.id,
-            Class.school_year == Config.get_current_school_year(),
-            Class.semester == Config.get_current_semester(),
-            Enrollment.status == 'enrolled'
-        ).scalar() or 0
+    # Total classes and current-semester students in one round-trip: the
+    # enrollment filters live in the outer join's ON clause so classes from
+    # other semesters are still counted
+    total_classes, current_students = db.session.query(
+        func.count(func.distinct(Class.id)),
+        func.count(func.distinct(Enrollment.student_id))
+    ).select_from(Class).outerjoin(Enrollment, and_(
+        Enrollment.class_id == Class.id,
+        Enrollment.status == 'enrolled',
+        Class.school_year == csy,
+        Class.semester == csem
+    )).filter(Class.teacher_id == teacher.id).one()
     
     # Total grades given
-    total_grades_given = Grade.query.join(Test).join(Class).filter(
-        Class.teacher_id == teacher.id,
+    total_grades_given = _teacher_grades_q(teacher.id).filter(
         Grade.final_grade.isnot(None)
     ).count()
     
@@ -1502,21 +1578,28 @@ def profile():
     years_teaching = max(1, (datetime.utcnow() - teacher.created_at).days // 365) if teacher.created_at else 1
     
     # Recent activity
-    recent_grades = Grade.query.join(Test).join(Class).filter(
-        Class.teacher_id == teacher.id,
+    # Eager-load student and test -> class (-> subject) so the loop below
+    # doesn't issue a lazy SELECT per grade
+    # Test and Class come from _teacher_grades_q's joins; only the student
+    # and subject are joined in for eager loading
+    recent_grades = _teacher_grades_q(teacher.id).options(
+        joinedload(Grade.student),
+        contains_eager(Grade.test).contains_eager(Test.class_).joinedload(Class.subject)
+    ).filter(
         Grade.graded_at.isnot(None)
     ).order_by(Grade.graded_at.desc()).limit(10).all()
     
     recent_activities = []
+    now = datetime.utcnow()
     for grade in recent_grades:
-        time_diff = datetime.utcnow() - grade.graded_at
+        secs = int((now - grade.graded_at).total_seconds())
         
-        if time_diff < timedelta(minutes=60):
-            time_ago = f"{time_diff.seconds // 60} minutes ago"
-        elif time_diff < timedelta(hours=24):
-            time_ago = f"{time_diff.seconds // 3600} hours ago"
+        if secs < 3600:
+            time_ago = f"{secs // 60} minutes ago"
+        elif secs < 86400:
+            time_ago = f"{secs // 3600} hours ago"
         else:
-            time_ago = f"{time_diff.days} days ago"
+            time_ago = f"{secs // 86400} days ago"
         
         recent_activities.append({
             'description': f"Graded {grade.student.get_full_name()} in {grade.test.class_.effective_subject_code}",
@@ -1646,18 +1729,7 @@ def update_components():
         ).first_or_404()
         
         # Get or create grade
-        grade = Grade.query.filter_by(
-            test_id=test_id,
-            student_id=student_id
-        ).first()
-        
-        if not grade:
-            grade = Grade(
-                test_id=test_id,
-                student_id=student_id,
-                graded_by=teacher.id
-            )
-            db.session.add(grade)
+        grade = Grade.get_or_create(test_id, student_id, graded_by=teacher.id)
         
         # Save component scores
         grade.set_component_scores(components)
@@ -1668,11 +1740,13 @@ def update_components():
         grade.graded_by = teacher.id
         grade.graded_at = datetime.utcnow()
         
-        db.session.commit()
-        
-        # Update enrollment final grade (average of all tests)
+        # Update enrollment final grade (average of all tests); the pending
+        # grade is autoflushed, so both writes go out in one commit
         update_enrollment_average(student_id, test.class_id)
         
+        db.session.commit()
+        _invalidate_analytics_cache(teacher.id)
+        
         return jsonify({
             'success': True,
             'final_grade': grade.final_grade,
@@ -1763,24 +1837,24 @@ def calculate_class_average(student_id, class_id):
     """
     Helper function to calculate student's average grade for a class
     """
-    # Get all grades for this student in this class
-    all_grades = Grade.query.join(Test).filter(
+    # Simple average of all test grades, computed in the database
+    # (AVG over no rows is NULL -> None)
+    average = db.session.query(func.avg(Grade.final_grade)).join(Test).filter(
         Test.class_id == class_id,
         Grade.student_id == student_id,
         Grade.final_grade.isnot(None)
-    ).all()
+    ).scalar()
     
-    if not all_grades:
+    if average is None:
         return None
     
-    # Simple average of all test grades
-    total = sum(g.final_grade for g in all_grades)
-    return round(total / len(all_grades), 2)
+    return round(float(average), 2)
 
 
 def update_enrollment_average(student_id, class_id):
     """
     Helper function to update enrollment average after grade change
+    Does not commit - the caller commits with the grade change.
     """
     enrollment = Enrollment.query.filter_by(
         student_id=student_id,
@@ -1790,7 +1864,6 @@ def update_enrollment_average(student_id, class_id):
     if enrollment:
         average = calculate_class_average(student_id, class_id)
         enrollment.final_grade = average
-        db.session.commit()
 
 
 @teacher_bp.route('/grading/export')
@@ -4,9 +4,20 @@ Manages different configurations for development, production, and testing enviro
 """
 
 import os
+import time
 from datetime import timedelta
 
 
+# Process-wide cache of SystemSettings lookups: {key: (value, expires_at)}
+# School year/semester change a few times a year, so a short TTL is plenty;
+# SystemSettings.set_setting()/delete_setting() clear it immediately.
+_settings_cache = {}
+
+# DEFAULT_GRADE_CONVERSION as NumPy arrays, built on first use
+# (see Config.percent_to_grade)
+_default_grade_lookup = None
+
+
 class Config:
     """
     Base Configuration Class
@@ -40,6 +51,15 @@ class Config:
     # Priority: Database > Auto-Calculate
     # ========================================
     
+    # Seconds a DB setting is reused before it is read again
+    SETTINGS_CACHE_TTL = int(os.environ.get('SETTINGS_CACHE_TTL', 300))
+    
+    # Seconds the teacher analytics page numbers are reused (0 disables).
+    # The cache is per worker process: a grade change clears it only in the
+    # worker that handled it, so other workers can show numbers up to this
+    # many seconds old.
+    ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL', 60))
+    
     @staticmethod
     def _auto_calculate_school_year():
         """
@@ -83,6 +103,45 @@ class Config:
         else:  # June-July
             return "Summer"
     
+    @staticmethod
+    def _get_db_setting(key):
+        """
+        Look up a SystemSettings value through two cache layers
+        
+        - flask.g: pages call get_current_school_year()/get_current_semester()
+          several times per request, so one request sees one value
+        - process level: reused for SETTINGS_CACHE_TTL seconds, so most
+          requests don't touch the DB at all
+        """
+        from flask import g, has_app_context
+        
+        cache = None
+        if has_app_context():
+            cache = g.setdefault('_system_settings', {})
+            if key in cache:
+                return cache[key]
+        
+        cached = _settings_cache.get(key)
+        if cached and cached[1] > time.monotonic():
+            value = cached[0]
+        else:
+            from models import SystemSettings
+            value = SystemSettings.get_setting(key)
+            _settings_cache[key] = (value, time.monotonic() + Config.SETTINGS_CACHE_TTL)
+        
+        if cache is not None:
+            cache[key] = value
+        return value
+    
+    @staticmethod
+    def clear_settings_cache():
+        """Drop cached SystemSettings values (call after changing a setting)"""
+        from flask import g, has_app_context
+        
+        _settings_cache.clear()
+        if has_app_context():
+            g.pop('_system_settings', None)
+    
     @staticmethod
     def get_current_school_year():
         """
@@ -90,8 +149,7 @@ class Config:
         Priority: Database setting > Auto-calculate
         """
         try:
-            from models import SystemSettings
-            db_value = SystemSettings.get_setting('current_school_year')
+            db_value = Config._get_db_setting('current_school_year')
             if db_value:
                 return db_value
         except:
@@ -108,8 +166,7 @@ class Config:
         Priority: Database setting > Auto-calculate
         """
         try:
-            from models import SystemSettings
-            db_value = SystemSettings.get_setting('current_semester')
+            db_value = Config._get_db_setting('current_semester')
             if db_value:
                 return db_value
         except:
@@ -144,6 +201,65 @@ class Config:
         "0-64": 5.0
     }
     
+    @staticmethod
+    def build_grade_lookup(conversion):
+        """
+        Precompute a conversion table as NumPy arrays indexed by whole percent
+        
+        Returns (grades, upper):
+        - grades[p] → PH grade for p%
+        - upper[p]  → top of the range containing p (-1 if no range does)
+        
+        Ranges are written in reverse so the first matching range wins,
+        like the loop in convert_to_ph_grade().
+        """
+        import numpy as np
+        
+        grades = np.full(101, 5.0)
+        upper = np.full(101, -1.0)
+        for range_str, grade in reversed(list(conversion.items())):
+            if '-' in range_str:
+                lo, hi = map(int, range_str.split('-'))
+            else:
+                lo = hi = int(range_str)
+            lo, hi = max(lo, 0), min(hi, 100)
+            grades[lo:hi + 1] = grade
+            upper[lo:hi + 1] = hi
+        return grades, upper
+    
+    @staticmethod
+    def percent_to_grade(percentages, lookup=None):
+        """
+        Vectorized percentage → PH grade conversion
+        
+        Args:
+            percentages: array-like of percentages
+            lookup: result of build_grade_lookup() (default table if omitted)
+        
+        Returns:
+            numpy array of PH grades. Same results as convert_to_ph_grade():
+            a fraction that falls between two ranges (e.g. 96.5) and anything
+            outside 0-100 converts to 5.0.
+        """
+        import numpy as np
+        
+        global _default_grade_lookup
+        if lookup is None:
+            if _default_grade_lookup is None:
+                _default_grade_lookup = Config.build_grade_lookup(Config.DEFAULT_GRADE_CONVERSION)
+            lookup = _default_grade_lookup
+        grades, upper = lookup
+        
+        pct = np.asarray(percentages, dtype=np.float64)
+        valid = (pct >= 0) & (pct <= 100)  # NaN is never valid
+        idx = np.where(valid, pct, 0).astype(np.intp)
+        return np.where(valid & (pct <= upper[idx]), grades[idx], 5.0)
+    
+    # Password hashing cost. Flask-Bcrypt reads this in init_app(), so every
+    # bcrypt.generate_password_hash() call uses it without passing rounds.
+    # Existing hashes keep their own cost, so changing it is always safe.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    
     # CSV Upload Settings
     CSV_ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
     CSV_MAX_ROWS = 10000  # Maximum rows per CSV upload
@@ -181,6 +297,9 @@ class DevelopmentConfig(Config):
     
     # Less strict session settings for development
     SESSION_COOKIE_SECURE = False
+    
+    # Cheaper password hashing for local accounts and seed scripts
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 10))
 
 
 class ProductionConfig(Config):
@@ -210,9 +329,14 @@ class ProductionConfig(Config):
     SESSION_COOKIE_SECURE = True  # Require HTTPS for cookies
     
     # Performance optimizations
-    SQLALCHEMY_POOL_SIZE = 10
-    SQLALCHEMY_POOL_RECYCLE = 3600  # Recycle connections after 1 hour
-    SQLALCHEMY_POOL_PRE_PING = True  # Verify connections before using
+    # Flask-SQLAlchemy 3.x only reads engine settings from
+    # SQLALCHEMY_ENGINE_OPTIONS (the old SQLALCHEMY_POOL_* keys are ignored)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'pool_recycle': 3600,     # Recycle connections after 1 hour
+        'pool_pre_ping': True,    # Verify connections before using
+        'query_cache_size': 1200  # Compiled statement cache (default 500)
+    }
     
     # Disable SQL query logging in production
     SQLALCHEMY_ECHO = False
@@ -246,6 +370,9 @@ class TestingConfig(Config):
     # Faster password hashing for tests
     BCRYPT_LOG_ROUNDS = 4
     
+    # Always recompute analytics so tests see fresh numbers
+    ANALYTICS_CACHE_TTL = 0
+    
     # Disable SQL query logging in tests
     SQLALCHEMY_ECHO = False
 
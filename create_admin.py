@@ -6,9 +6,10 @@ Run this from your project root directory: python create_admin.py
 from app import create_app
 from models import User
 from extensions import db, bcrypt
+from sqlalchemy import func
 
 # Create app instance
-app = create_app('development')
+app = create_app('development', with_migrations=False)
 
 with app.app_context():
     # Check if admin already exists
@@ -37,11 +38,15 @@ with app.app_context():
         print("-" * 50)
         print("⚠️ IMPORTANT: Change this password after first login!")
     
-    # Show all users
-    all_users = User.query.all()
-    print(f"\n📊 Total users in database: {len(all_users)}")
+    # Show users (count in SQL, list only the first few)
+    total_users = db.session.query(func.count(User.id)).scalar()
+    print(f"\n📊 Total users in database: {total_users}")
     
-    if all_users:
-        print("\nAll users:")
-        for user in all_users:
-            print(f"  • {user.email} ({user.role})")
\ No newline at end of file
+    if total_users:
+        shown = User.query.with_entities(User.email, User.role)\
+            .order_by(User.id).limit(20).all()
+        print("\nUsers:" if total_users > len(shown) else "\nAll users:")
+        for email, role in shown:
+            print(f"  • {email} ({role})")
+        if total_users > len(shown):
+            print(f"  ... and {total_users - len(shown)} more")
@@ -6,28 +6,98 @@ Usage: python create_test_data.py
 """
 
 from app import create_app
-from extensions import db, bcrypt
+from extensions import db
 from models import User, Student, Teacher, Subject, Class, Enrollment, Test, Grade
 from datetime import datetime, date, timedelta
+from itertools import product
+from flask_bcrypt import generate_password_hash
+from sqlalchemy import insert, text, update
+import numpy as np
 import random
 
-def create_test_data():
-    """Create comprehensive test data for the Acadify system"""
+# bcrypt cost for seeded accounts. These are throwaway fixtures, so use the
+# minimum; real sign-ups and password changes still use the app's
+# BCRYPT_LOG_ROUNDS setting.
+TEST_BCRYPT_ROUNDS = 4
+
+# Realistic grade mix to draw from (1.0 - 3.0 mostly, some 4.0, rare 5.0)
+GRADE_POOL = np.array((1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5, 2.75, 3.0) * 10 + (4.0, 4.0, 5.0))
+
+
+# Seeded tables, children first so plain DELETEs respect foreign keys
+SEED_MODELS = [Grade, Test, Enrollment, Class, Subject, Student, Teacher, User]
+
+
+def _tune_connection_for_seeding():
+    """
+    SQLite: lower fsync strictness for this connection only.
+    journal_mode=WAL is deliberately not set - it would persist in the
+    (tracked) dev database file.
+    PostgreSQL needs nothing here: SQLAlchemy 2.x psycopg2 already sends
+    executemany INSERTs as batched multi-VALUES statements (insertmanyvalues).
+    """
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('PRAGMA synchronous=NORMAL'))
+
+
+def _clear_tables():
+    """
+    Empty all seeded tables.
+    PostgreSQL: one TRUNCATE (no per-row MVCC work, ids restart at 1).
+    Other databases (SQLite): one DELETE per table.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        preparer = db.engine.dialect.identifier_preparer
+        tables = ', '.join(preparer.format_table(model.__table__) for model in SEED_MODELS)
+        db.session.execute(text(f'TRUNCATE {tables} RESTART IDENTITY CASCADE'))
+    else:
+        for model in SEED_MODELS:
+            db.session.execute(model.__table__.delete())
+
+
+def _insert_rows(model, rows, return_ids=False):
+    """
+    Insert a list of row dicts with one executemany (batched multi-VALUES
+    INSERTs) instead of adding ORM objects one by one.
+    With return_ids=True, returns the new primary keys in row order.
+    """
+    if return_ids:
+        stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+        return db.session.execute(stmt, rows).scalars().all()
+    db.session.execute(insert(model), rows)
+
+
+def _hash_password(password, rounds):
+    """bcrypt one password"""
+    return generate_password_hash(password, rounds).decode('utf-8')
+
+
+def _hash_passwords(passwords, rounds):
+    """Hash each distinct password once. Returns {password: hash}."""
+    return {password: _hash_password(password, rounds) for password in set(passwords)}
+
+
+def create_test_data(seed=None):
+    """
+    Create comprehensive test data for the Acadify system
     
-    app = create_app('development')
+    Args:
+        seed: optional int - makes the generated data reproducible
+    """
+    # NumPy generator for the sampling/score draws; names and year levels
+    # still come from the stdlib generator, seeded alongside it
+    rng = np.random.default_rng(seed)
+    if seed is not None:
+        random.seed(seed)
+    
+    app = create_app('development', with_migrations=False)
     
     with app.app_context():
+        _tune_connection_for_seeding()
+        
         print("🗑️  Clearing existing data...")
         # Clear existing data (be careful with this in production!)
-        Grade.query.delete()
-        Test.query.delete()
-        Enrollment.query.delete()
-        Class.query.delete()
-        Subject.query.delete()
-        Student.query.delete()
-        Teacher.query.delete()
-        User.query.delete()
-        db.session.commit()
+        _clear_tables()
         
         print("👨‍🏫 Creating Teachers...")
         # Create teacher users
@@ -61,30 +131,49 @@ def create_test_data():
             }
         ]
         
-        teachers = []
-        for data in teacher_users_data:
-            # Create user account
-            user = User(
-                email=data['email'],
-                password=bcrypt.generate_password_hash(data['password']).decode('utf-8'),
-                role='teacher'
-            )
-            db.session.add(user)
-            db.session.flush()
-            
-            # Create teacher profile
-            teacher = Teacher(
-                user_id=user.id,
-                employee_number=data['employee_number'],
-                first_name=data['first_name'],
-                last_name=data['last_name'],
-                department=data['department'],
-                specialization=data['specialization']
-            )
-            db.session.add(teacher)
-            teachers.append(teacher)
+        # Hash each distinct password once, all up front
+        # (the teachers share one password, the students another)
+        student_password = 'student123'
+        pw_hashes = _hash_passwords(
+            [data['password'] for data in teacher_users_data] + [student_password],
+            TEST_BCRYPT_ROUNDS
+        )
+        
+        num_students = 30  # Create 30 students
+        
+        # Create every user account - teachers and students - in one
+        # INSERT ... RETURNING; ids come back in row order
+        user_ids = _insert_rows(User, [
+            {
+                'email': data['email'],
+                'password': pw_hashes[data['password']],
+                'role': 'teacher'
+            }
+            for data in teacher_users_data
+        ] + [
+            {
+                'email': f'student{i+1}@acadify.edu',
+                'password': pw_hashes[student_password],
+                'role': 'student'
+            }
+            for i in range(num_students)
+        ], return_ids=True)
+        teacher_user_ids = user_ids[:len(teacher_users_data)]
+        student_user_ids = user_ids[len(teacher_users_data):]
+        
+        # Create teacher profiles
+        teachers = _insert_rows(Teacher, [
+            {
+                'user_id': user_id,
+                'employee_number': data['employee_number'],
+                'first_name': data['first_name'],
+                'last_name': data['last_name'],
+                'department': data['department'],
+                'specialization': data['specialization']
+            }
+            for user_id, data in zip(teacher_user_ids, teacher_users_data)
+        ], return_ids=True)
         
-        db.session.commit()
         print(f"   ✅ Created {len(teachers)} teachers")
         
         print("👨‍🎓 Creating Students...")
@@ -93,35 +182,21 @@ def create_test_data():
                               'Diego', 'Valentina', 'Luis', 'Carmen', 'Roberto', 'Elena', 'Fernando', 'Paula', 'Ricardo', 'Beatriz']
         student_last_names = ['Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Lopez', 'Martinez', 'Gonzales', 'Rodriguez', 'Hernandez', 'Perez']
         
-        students = []
-        for i in range(30):  # Create 30 students
-            first_name = random.choice(student_first_names)
-            last_name = random.choice(student_last_names)
-            
-            # Create user account
-            user = User(
-                email=f'student{i+1}@acadify.edu',
-                password=bcrypt.generate_password_hash('student123').decode('utf-8'),
-                role='student'
-            )
-            db.session.add(user)
-            db.session.flush()
-            
-            # Create student profile
-            student = Student(
-                user_id=user.id,
-                student_number=f'2024-{str(i+1).zfill(5)}',
-                first_name=first_name,
-                last_name=last_name,
-                department='College of Engineering',
-                program='BS Computer Science',
-                year_level=random.choice(['1st Year', '2nd Year', '3rd Year', '4th Year']),
-                section=random.choice(['A', 'B', 'C', None])
-            )
-            db.session.add(student)
-            students.append(student)
+        # Create student profiles
+        students = _insert_rows(Student, [
+            {
+                'user_id': user_id,
+                'student_number': f'2024-{str(i+1).zfill(5)}',
+                'first_name': random.choice(student_first_names),
+                'last_name': random.choice(student_last_names),
+                'department': 'College of Engineering',
+                'program': 'BS Computer Science',
+                'year_level': random.choice(['1st Year', '2nd Year', '3rd Year', '4th Year']),
+                'section': random.choice(['A', 'B', 'C', None])
+            }
+            for i, user_id in enumerate(student_user_ids)
+        ], return_ids=True)
         
-        db.session.commit()
         print(f"   ✅ Created {len(students)} students")
         
         print("📚 Creating Subjects...")
@@ -137,23 +212,24 @@ def create_test_data():
             {'code': 'PE101', 'name': 'Physical Education 1', 'units': 2, 'is_major': False}
         ]
         
-        subjects = []
-        for data in subjects_data:
-            subject = Subject(
-                code=data['code'],
-                name=data['name'],
-                units=data['units'],
-                is_major_subject=data['is_major']
-            )
-            db.session.add(subject)
-            subjects.append(subject)
+        subject_ids = _insert_rows(Subject, [
+            {
+                'code': data['code'],
+                'name': data['name'],
+                'units': data['units'],
+                'is_major_subject': data['is_major']
+            }
+            for data in subjects_data
+        ], return_ids=True)
+        
+        # Keep id alongside the source data (classes need both)
+        subjects = [dict(data, id=subject_id) for subject_id, data in zip(subject_ids, subjects_data)]
         
-        db.session.commit()
         print(f"   ✅ Created {len(subjects)} subjects")
         
         print("🏫 Creating Classes...")
         # Create classes for the main teacher (Prof. Mendoza - index 1)
-        main_teacher = teachers[1]  # Prof. Mendoza
+        main_teacher = teachers[1]  # Prof. Mendoza (teacher id)
         
         classes_data = [
             {
@@ -194,94 +270,114 @@ def create_test_data():
             }
         ]
         
-        classes = []
-        for data in classes_data:
-            cls = Class(
-                teacher_id=main_teacher.id,
-                subject_id=data['subject'].id,
-                section=data['section'],
-                schedule=data['schedule'],
-                room=data['room'],
-                school_year='2024-2025',
-                semester='1st Semester',
-                max_students=40
-            )
-            db.session.add(cls)
-            classes.append(cls)
+        class_ids = _insert_rows(Class, [
+            {
+                'teacher_id': main_teacher,
+                'subject_id': data['subject']['id'],
+                'units': data['subject']['units'],
+                'is_major': data['subject']['is_major'],
+                'section': data['section'],
+                'schedule': data['schedule'],
+                'room': data['room'],
+                'school_year': '2024-2025',
+                'semester': '1st Semester',
+                'max_students': 40
+            }
+            for data in classes_data
+        ], return_ids=True)
+        
+        classes = [dict(data, id=class_id) for class_id, data in zip(class_ids, classes_data)]
         
-        db.session.commit()
         print(f"   ✅ Created {len(classes)} classes")
         
         print("📝 Enrolling Students in Classes...")
         # Enroll students in classes (random enrollment)
-        enrollments = []
+        # Enrolled students per class (also used for grades below)
+        class_students = {}
         for cls in classes:
-            # Randomly select 20-35 students per class
-            num_students = random.randint(20, 35)
-            enrolled_students = random.sample(students, num_students)
-            
-            for student in enrolled_students:
-                enrollment = Enrollment(
-                    student_id=student.id,
-                    class_id=cls.id,
-                    status='enrolled'
-                )
-                db.session.add(enrollment)
-                enrollments.append(enrollment)
+            # Randomly select 20-35 students per class (capped at the 30 created)
+            num_enrolled = min(int(rng.integers(20, 36)), len(students))
+            class_students[cls['id']] = [students[i] for i in rng.choice(len(students), size=num_enrolled, replace=False)]
         
-        db.session.commit()
+        enrollments = [
+            {'student_id': student_id, 'class_id': class_id, 'status': 'enrolled'}
+            for class_id, student_ids in class_students.items()
+            for student_id in student_ids
+        ]
+        
+        _insert_rows(Enrollment, enrollments)
+        # Core inserts skip the ORM listeners that maintain Class.enrolled_count
+        db.session.execute(update(Class), [
+            {'id': class_id, 'enrolled_count': len(student_ids)}
+            for class_id, student_ids in class_students.items()
+        ])
         print(f"   ✅ Created {len(enrollments)} enrollments")
         
         print("📋 Creating Tests/Assignments...")
         # Create tests for each class
         test_types = ['Quiz 1', 'Quiz 2', 'Midterm Exam', 'Quiz 3', 'Final Exam', 'Project']
         
-        tests = []
-        for cls in classes:
-            for i, test_name in enumerate(test_types):
-                test = Test(
-                    class_id=cls.id,
-                    title=test_name,
-                    description=f'{test_name} for {cls.subject.name}',
-                    test_date=date.today() - timedelta(days=random.randint(1, 60))
-                )
-                db.session.add(test)
-                tests.append(test)
+        today = date.today()
+        days_ago = rng.integers(1, 61, size=len(classes) * len(test_types)).tolist()
+        tests = [
+            {
+                'class_id': cls['id'],
+                'title': test_name,
+                'description': f"{test_name} for {cls['subject']['name']}",
+                'test_date': today - timedelta(days=days)
+            }
+            for (cls, test_name), days in zip(product(classes, test_types), days_ago)
+        ]
+        
+        test_ids = _insert_rows(Test, tests, return_ids=True)
+        for test, test_id in zip(tests, test_ids):
+            test['id'] = test_id
         
-        db.session.commit()
         print(f"   ✅ Created {len(tests)} tests")
         
         print("✅ Creating Grades...")
         # Create grades for students (random grades)
-        grades = []
+        
+        now = datetime.utcnow()
+        
+        draws = []
         for test in tests:
             # Get enrolled students for this test's class
-            class_enrollments = Enrollment.query.filter_by(
-                class_id=test.class_id,
-                status='enrolled'
-            ).all()
+            class_enrollments = class_students[test['class_id']]
             
             # Randomly decide how many students have been graded (60-100%)
-            num_graded = int(len(class_enrollments) * random.uniform(0.6, 1.0))
-            graded_students = random.sample(class_enrollments, num_graded)
+            num_graded = int(len(class_enrollments) * rng.uniform(0.6, 1.0))
+            graded_students = [class_enrollments[i] for i in rng.choice(len(class_enrollments), size=num_graded, replace=False)]
             
-            for enrollment in graded_students:
-                # Generate realistic grades (1.0 - 3.0 mostly, some 4.0, rare 5.0)
-                grade_pool = [1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5, 2.75, 3.0] * 10 + [4.0] * 2 + [5.0]
-                final_grade = random.choice(grade_pool)
-                
-                grade = Grade(
-                    test_id=test.id,
-                    student_id=enrollment.student_id,
-                    calculated_percentage=random.uniform(75, 100),
-                    calculated_grade=final_grade,
-                    final_grade=final_grade,
-                    graded_by=main_teacher.id,
-                    graded_at=datetime.utcnow() - timedelta(days=random.randint(1, 30))
-                )
-                db.session.add(grade)
-                grades.append(grade)
+            # Draw every random value for this test in one call each
+            # (.tolist() turns them back into plain floats/ints for the driver)
+            draws.append((
+                test['id'],
+                graded_students,
+                rng.choice(GRADE_POOL, size=num_graded).tolist(),
+                rng.uniform(75, 100, size=num_graded).tolist(),
+                rng.integers(1, 31, size=num_graded).tolist()
+            ))
+        
+        # Build all grade rows in a single comprehension
+        grades = [
+            {
+                'test_id': test_id,
+                'student_id': student_id,
+                'calculated_percentage': percentage,
+                'calculated_grade': final_grade,
+                'final_grade': final_grade,
+                'graded_by': main_teacher,
+                'graded_at': now - timedelta(days=days)
+            }
+            for test_id, graded_students, final_grades, percentages, days_ago in draws
+            for student_id, final_grade, percentage, days in zip(
+                graded_students, final_grades, percentages, days_ago)
+        ]
+        
+        _insert_rows(Grade, grades)
         
+        # Everything above runs in one transaction - a single COMMIT at the end
         db.session.commit()
         print(f"   ✅ Created {len(grades)} grades")
         
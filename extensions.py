@@ -4,10 +4,18 @@ Initialize Flask extensions here to avoid circular imports.
 Extensions are created here but initialized in app.py with init_app().
 """
 
+from functools import cache
+
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.local import LocalProxy
+
+try:
+    import orjson
+except ImportError:  # optional - falls back to Flask's stdlib json provider
+    orjson = None
 
 # Database ORM (Object-Relational Mapping)
 # Allows us to work with database tables as Python objects
@@ -16,7 +24,14 @@ db = SQLAlchemy()
 # Database Migration Tool
 # Manages database schema changes (like version control for your database)
 # Usage: flask db init, flask db migrate, flask db upgrade
-migrate = Migrate()
+# Created on first use so scripts that never migrate (create_test_data.py,
+# create_admin.py) don't import Flask-Migrate/Alembic at all
+@cache
+def _get_migrate():
+    from flask_migrate import Migrate
+    return Migrate()
+
+migrate = LocalProxy(_get_migrate)
 
 # User Session Management
 # Handles user login/logout, session persistence, and authentication
@@ -24,4 +39,50 @@ login_manager = LoginManager()
 
 # Password Hashing
 # Securely hash and verify passwords (never store plain text passwords!)
-bcrypt = Bcrypt()
\ No newline at end of file
+bcrypt = Bcrypt()
+
+
+# Fast JSON (optional)
+# Encodes jsonify() responses and decodes request.get_json() with orjson.
+# Types orjson doesn't handle natively (datetime, Decimal, ...) go through
+# Flask's default() so responses look the same as with the stdlib provider.
+class ORJSONProvider(DefaultJSONProvider):
+    _OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {'indent', 'separators'}:
+            # Arguments orjson has no equivalent for - use the stdlib encoder
+            return super().dumps(obj, **kwargs)
+
+        # orjson output is always compact unless indented, so 'separators'
+        # needs no translation
+        option = self._OPTIONS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def _orjson_default(obj):
+    # Numbers the stdlib encoder also accepts (float/int subclasses such as
+    # numpy.float64) but orjson rejects
+    if isinstance(obj, float):
+        return float(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+
+def orjson_dumps(obj):
+    """
+    json.dumps() replacement for stored JSON (model columns). Same values,
+    compact output; non-string keys become strings like the stdlib does.
+    """
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    return orjson.dumps(obj, default=_orjson_default, option=option).decode('utf-8')
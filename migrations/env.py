@@ -90,11 +90,20 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    connectable = get_engine()
+
+    # ix_grade_comp_gin is a PostgreSQL-only GIN index (the model skips it
+    # elsewhere via ddl_if), so don't let autogenerate on SQLite add it
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'index' and name == 'ix_grade_comp_gin':
+            return connectable.dialect.name == 'postgresql'
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
-
-    connectable = get_engine()
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     with connectable.connect() as connection:
         context.configure(
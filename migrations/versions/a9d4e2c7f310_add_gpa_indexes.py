@@ -0,0 +1,37 @@
+"""Add indexes for GPA lookups
+
+Revision ID: a9d4e2c7f310
+Revises: f2c8a4e61b07
+Create Date: 2026-10-16 15:47:12.804533
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d4e2c7f310'
+down_revision = 'f2c8a4e61b07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.create_index('ix_class_year_sem', ['school_year', 'semester'], unique=False)
+        batch_op.create_index('ix_class_subject', ['subject_id'], unique=False)
+
+    # Partial index - GPA only reads graded rows
+    op.create_index(
+        'ix_grade_student_final', 'grade', ['student_id', 'test_id', 'final_grade'], unique=False,
+        postgresql_where=sa.text('final_grade IS NOT NULL'),
+        sqlite_where=sa.text('final_grade IS NOT NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_grade_student_final', table_name='grade')
+
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.drop_index('ix_class_subject')
+        batch_op.drop_index('ix_class_year_sem')
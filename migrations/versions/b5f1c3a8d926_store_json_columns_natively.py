@@ -0,0 +1,74 @@
+"""Store component scores and subject formula/conversion as native JSON
+
+Revision ID: b5f1c3a8d926
+Revises: a9d4e2c7f310
+Create Date: 2026-10-16 16:20:38.117942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f1c3a8d926'
+down_revision = 'a9d4e2c7f310'
+branch_labels = None
+depends_on = None
+
+
+JSON_COLUMNS = [
+    ('grade', 'component_scores'),
+    ('subject', 'grading_formula'),
+    ('subject', 'grade_conversion'),
+]
+
+
+# Casts a legacy TEXT value to jsonb, NULL for values that never parsed
+# (the same as the SQLite branch), so one bad row can't abort the upgrade
+SAFE_JSONB_FUNCTION = """
+CREATE FUNCTION _safe_jsonb(raw text) RETURNS jsonb AS $$
+BEGIN
+    RETURN NULLIF(raw, '')::jsonb;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE
+"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(SAFE_JSONB_FUNCTION)
+        for table, column in JSON_COLUMNS:
+            op.alter_column(
+                table, column,
+                type_=postgresql.JSONB(),
+                postgresql_using=f'_safe_jsonb({column})'
+            )
+        op.execute('DROP FUNCTION _safe_jsonb(text)')
+        op.create_index('ix_grade_comp_gin', 'grade', ['component_scores'], postgresql_using='gin')
+    else:
+        # SQLite stores JSON as TEXT either way - clear values that never
+        # parsed (get_component_scores() used to map those to {}), then
+        # declare the columns JSON so the schema matches the models
+        for table, column in JSON_COLUMNS:
+            op.execute(f'UPDATE {table} SET {column} = NULL WHERE json_valid({column}) = 0')
+        for table, column in JSON_COLUMNS:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.alter_column(column, existing_type=sa.Text(), type_=sa.JSON())
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_grade_comp_gin', table_name='grade')
+        for table, column in JSON_COLUMNS:
+            op.alter_column(
+                table, column,
+                type_=sa.Text(),
+                postgresql_using=f'{column}::text'
+            )
+    else:
+        for table, column in JSON_COLUMNS:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.alter_column(column, existing_type=sa.JSON(), type_=sa.Text())
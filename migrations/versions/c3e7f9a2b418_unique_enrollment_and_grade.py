@@ -0,0 +1,60 @@
+"""Unique (student, class) enrollments and (test, student) grades
+
+Revision ID: c3e7f9a2b418
+Revises: b5f1c3a8d926
+Create Date: 2026-10-16 17:05:51.640297
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e7f9a2b418'
+down_revision = 'b5f1c3a8d926'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicates first, keeping the row that carries the real data:
+    # for enrollments the active one (update_class used to insert a new
+    # 'enrolled' row next to the old 'dropped' one), then a graded one,
+    # then the newest; for grades a graded/scored one, then the most
+    # recently updated
+    op.execute(
+        'DELETE FROM enrollment WHERE id IN ('
+        'SELECT id FROM ('
+        'SELECT id, ROW_NUMBER() OVER ('
+        'PARTITION BY student_id, class_id '
+        "ORDER BY (status = 'enrolled') DESC, (final_grade IS NOT NULL) DESC, id DESC"
+        ') AS rn FROM enrollment'
+        ') ranked WHERE rn > 1)'
+    )
+    op.execute(
+        'DELETE FROM grade WHERE id IN ('
+        'SELECT id FROM ('
+        'SELECT id, ROW_NUMBER() OVER ('
+        'PARTITION BY test_id, student_id '
+        'ORDER BY (final_grade IS NOT NULL) DESC, (component_scores IS NOT NULL) DESC, '
+        'COALESCE(updated_at, created_at) IS NULL, COALESCE(updated_at, created_at) DESC, id DESC'
+        ') AS rn FROM grade'
+        ') ranked WHERE rn > 1)'
+    )
+    op.execute(
+        'UPDATE class SET enrolled_count = ('
+        "SELECT COUNT(*) FROM enrollment WHERE enrollment.class_id = class.id AND enrollment.status = 'enrolled')"
+    )
+
+    with op.batch_alter_table('enrollment', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_enrollment_student_class', ['student_id', 'class_id'])
+
+    with op.batch_alter_table('grade', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_grade_test_student', ['test_id', 'student_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('grade', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_grade_test_student', type_='unique')
+
+    with op.batch_alter_table('enrollment', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_enrollment_student_class', type_='unique')
@@ -0,0 +1,47 @@
+"""Add composite indexes for analytics filters
+
+Revision ID: c4d2e8f1a9b3
+Revises: 6b31130f5732
+Create Date: 2026-10-16 10:02:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d2e8f1a9b3'
+down_revision = '6b31130f5732'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.create_index('ix_class_teacher_year_sem', ['teacher_id', 'school_year', 'semester'], unique=False)
+
+    with op.batch_alter_table('enrollment', schema=None) as batch_op:
+        batch_op.create_index('ix_enrollment_class_status', ['class_id', 'status'], unique=False)
+
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.create_index('ix_test_class', ['class_id'], unique=False)
+
+    # Partial index - only graded rows are ever aggregated
+    op.create_index(
+        'ix_grade_final', 'grade', ['test_id'], unique=False,
+        postgresql_where=sa.text('final_grade IS NOT NULL'),
+        sqlite_where=sa.text('final_grade IS NOT NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_grade_final', table_name='grade')
+
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.drop_index('ix_test_class')
+
+    with op.batch_alter_table('enrollment', schema=None) as batch_op:
+        batch_op.drop_index('ix_enrollment_class_status')
+
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.drop_index('ix_class_teacher_year_sem')
@@ -0,0 +1,44 @@
+"""Add student_transcript_view
+
+Revision ID: d8b2f6e4a170
+Revises: c3e7f9a2b418
+Create Date: 2026-10-16 17:21:40.118305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b2f6e4a170'
+down_revision = 'c3e7f9a2b418'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE VIEW student_transcript_view AS
+        SELECT
+            e.id          AS enrollment_id,
+            e.student_id  AS student_id,
+            e.class_id    AS class_id,
+            e.status      AS status,
+            e.final_grade AS final_grade,
+            c.school_year AS school_year,
+            c.semester    AS semester,
+            COALESCE(NULLIF(c.subject_code, ''), s.code) AS subject_code,
+            COALESCE(NULLIF(c.subject_name, ''), s.name) AS subject_name,
+            COALESCE(c.units, s.units, 3) AS units,
+            CASE
+                WHEN c.is_major IS NOT NULL THEN c.is_major
+                WHEN s.id IS NOT NULL THEN s.is_major_subject
+                ELSE TRUE
+            END AS is_major
+        FROM enrollment e
+        JOIN "class" c ON c.id = e.class_id
+        LEFT JOIN subject s ON s.id = c.subject_id
+    """)
+
+
+def downgrade():
+    op.execute('DROP VIEW IF EXISTS student_transcript_view')
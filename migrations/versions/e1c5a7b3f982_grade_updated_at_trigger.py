@@ -0,0 +1,46 @@
+"""Set grade.updated_at with a trigger
+
+Revision ID: e1c5a7b3f982
+Revises: d8b2f6e4a170
+Create Date: 2026-10-16 17:58:03.642117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1c5a7b3f982'
+down_revision = 'd8b2f6e4a170'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.updated_at := timezone('utc', now());
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute("""
+            CREATE TRIGGER grade_updated_at BEFORE UPDATE ON grade
+            FOR EACH ROW EXECUTE FUNCTION set_updated_at()
+        """)
+    else:
+        op.execute("""
+            CREATE TRIGGER grade_updated_at AFTER UPDATE ON grade
+            FOR EACH ROW BEGIN
+                UPDATE grade SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+            END
+        """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS grade_updated_at ON grade')
+        op.execute('DROP FUNCTION IF EXISTS set_updated_at()')
+    else:
+        op.execute('DROP TRIGGER IF EXISTS grade_updated_at')
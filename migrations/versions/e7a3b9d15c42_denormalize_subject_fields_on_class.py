@@ -0,0 +1,34 @@
+"""Denormalize subject units/is_major onto class
+
+Revision ID: e7a3b9d15c42
+Revises: c4d2e8f1a9b3
+Create Date: 2026-10-16 14:21:07.552810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3b9d15c42'
+down_revision = 'c4d2e8f1a9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_major', sa.Boolean(), nullable=True))
+
+    # Backfill from the linked subject; manual units are kept as-is
+    op.execute(
+        'UPDATE class SET '
+        'is_major = (SELECT subject.is_major_subject FROM subject WHERE subject.id = class.subject_id), '
+        'units = COALESCE(units, (SELECT subject.units FROM subject WHERE subject.id = class.subject_id)) '
+        'WHERE subject_id IS NOT NULL'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.drop_column('is_major')
@@ -0,0 +1,31 @@
+"""Add denormalized enrolled_count to class
+
+Revision ID: f2c8a4e61b07
+Revises: e7a3b9d15c42
+Create Date: 2026-10-16 15:03:44.190265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8a4e61b07'
+down_revision = 'e7a3b9d15c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('enrolled_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute(
+        'UPDATE class SET enrolled_count = ('
+        "SELECT COUNT(*) FROM enrollment WHERE enrollment.class_id = class.id AND enrollment.status = 'enrolled')"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('class', schema=None) as batch_op:
+        batch_op.drop_column('enrolled_count')
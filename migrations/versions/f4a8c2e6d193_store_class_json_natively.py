@@ -0,0 +1,100 @@
+"""Store class grading formula/conversion table as native JSON
+
+Revision ID: f4a8c2e6d193
+Revises: e1c5a7b3f982
+Create Date: 2026-10-16 18:42:17.530264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a8c2e6d193'
+down_revision = 'e1c5a7b3f982'
+branch_labels = None
+depends_on = None
+
+
+JSON_COLUMNS = ['grading_formula', 'grade_conversion_table']
+
+
+# Casts a legacy TEXT value to jsonb, NULL for values that never parsed
+# (the same as the SQLite branch), so one bad row can't abort the upgrade
+SAFE_JSONB_FUNCTION = """
+CREATE FUNCTION _safe_jsonb(raw text) RETURNS jsonb AS $$
+BEGIN
+    RETURN NULLIF(raw, '')::jsonb;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE
+"""
+
+
+# SQLite rebuilds "class" to change a column type, and won't rename the new
+# table into place while a view still references the old one - so the
+# transcript view (as created in d8b2f6e4a170) is dropped and recreated
+# around the rebuild
+TRANSCRIPT_VIEW_SQL = """
+CREATE VIEW student_transcript_view AS
+SELECT
+    e.id          AS enrollment_id,
+    e.student_id  AS student_id,
+    e.class_id    AS class_id,
+    e.status      AS status,
+    e.final_grade AS final_grade,
+    c.school_year AS school_year,
+    c.semester    AS semester,
+    COALESCE(NULLIF(c.subject_code, ''), s.code) AS subject_code,
+    COALESCE(NULLIF(c.subject_name, ''), s.name) AS subject_name,
+    COALESCE(c.units, s.units, 3) AS units,
+    CASE
+        WHEN c.is_major IS NOT NULL THEN c.is_major
+        WHEN s.id IS NOT NULL THEN s.is_major_subject
+        ELSE TRUE
+    END AS is_major
+FROM enrollment e
+JOIN "class" c ON c.id = e.class_id
+LEFT JOIN subject s ON s.id = c.subject_id
+"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(SAFE_JSONB_FUNCTION)
+        for column in JSON_COLUMNS:
+            op.alter_column(
+                'class', column,
+                type_=postgresql.JSONB(),
+                postgresql_using=f'_safe_jsonb({column})'
+            )
+        op.execute('DROP FUNCTION _safe_jsonb(text)')
+    else:
+        # SQLite stores JSON as TEXT either way - clear values that never
+        # parsed (get_grading_formula() used to fall back to the defaults for
+        # those), then declare the columns JSON so the schema matches the models
+        for column in JSON_COLUMNS:
+            op.execute(f'UPDATE "class" SET {column} = NULL WHERE json_valid({column}) = 0')
+        op.execute('DROP VIEW IF EXISTS student_transcript_view')
+        with op.batch_alter_table('class', schema=None) as batch_op:
+            for column in JSON_COLUMNS:
+                batch_op.alter_column(column, existing_type=sa.Text(), type_=sa.JSON())
+        op.execute(TRANSCRIPT_VIEW_SQL)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in JSON_COLUMNS:
+            op.alter_column(
+                'class', column,
+                type_=sa.Text(),
+                postgresql_using=f'{column}::text'
+            )
+    else:
+        op.execute('DROP VIEW IF EXISTS student_transcript_view')
+        with op.batch_alter_table('class', schema=None) as batch_op:
+            for column in JSON_COLUMNS:
+                batch_op.alter_column(column, existing_type=sa.JSON(), type_=sa.Text())
+        op.execute(TRANSCRIPT_VIEW_SQL)
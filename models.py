@@ -3,13 +3,127 @@ models.py - Complete Database Models for Acadify
 Philippine College Grading System with Customizable Formulas
 """
 
+from config import Config
 from extensions import db
 from flask_login import UserMixin
 from datetime import datetime
-from sqlalchemy import func
-import json
+from functools import lru_cache
+from types import MappingProxyType
+from sqlalchemy import DDL, Column, FetchedValue, MetaData, Table, case, event, func, inspect, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+import copy
 import os
 
+# Native JSON column: JSONB on PostgreSQL (parsed once by the driver, GIN
+# indexable), JSON-as-TEXT elsewhere. SQL NULL, not 'null', for None.
+JSONDocument = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
+# Used by classes with no formula of their own or on their subject.
+# Shared - callers must not mutate it.
+DEFAULT_GRADING_FORMULA = {
+    "components": [
+        {"name": "Midterm Exam", "weight": 50},
+        {"name": "Final Exam", "weight": 50}
+    ],
+    "passing_grade": 3.0,
+    "use_philippine_conversion": True
+}
+
+# Default PH grading scale for subjects/classes without their own table.
+# One shared read-only view, not a new dict per call.
+DEFAULT_GRADE_CONVERSION = MappingProxyType(Config.DEFAULT_GRADE_CONVERSION)
+
+
+def formula_weight_total(components):
+    """
+    Total of the component weights, summed in integer hundredths so
+    fractional weights add up exactly (33.33 + 33.33 + 33.34 == 100).
+    """
+    hundredths = sum(round(c.get('weight', 0) * 100) for c in components)
+    return hundredths // 100 if hundredths % 100 == 0 else hundredths / 100
+
+
+@lru_cache(maxsize=1024)
+def _compile_conversion(conversion_items):
+    """
+    Compile a conversion table (as a tuple of its items) into the 101-entry
+    tables from Config.build_grade_lookup(), as plain lists: converting a
+    percentage is then two list indexes instead of parsing every "min-max"
+    string (indexing a list is much cheaper than a NumPy scalar).
+    
+    Returns None for tables with overlapping ranges or ranges outside 0-100;
+    those keep the first-match scan in _scan_conversion().
+    """
+    covered = [0] * 101
+    for range_str, _ in conversion_items:
+        if '-' in range_str:
+            lo, hi = map(int, range_str.split('-'))
+        else:
+            lo = hi = int(range_str)
+        if lo < 0 or hi > 100:
+            return None
+        for p in range(lo, hi + 1):
+            covered[p] += 1
+    if max(covered) > 1:
+        return None
+    grades, upper = Config.build_grade_lookup(dict(conversion_items))
+    return grades.tolist(), upper.tolist()
+
+
+def _scan_conversion(conversion, percentage):
+    """Original first-match scan over a conversion table"""
+    for range_str, grade in conversion.items():
+        if '-' in range_str:
+            min_score, max_score = map(int, range_str.split('-'))
+            if min_score <= percentage <= max_score:
+                return grade
+        else:
+            if percentage == int(range_str):
+                return grade
+    
+    return 5.0  # Failed if no match
+
+
+def _conversion_table(obj, raw, get_conversion):
+    """
+    (conversion dict, compiled table) for a Subject/Class, memoized on the
+    instance until the raw conversion column value changes
+    """
+    cached = obj._table_cache
+    if cached is None or cached[0] is not raw:
+        conversion = get_conversion()
+        cached = obj._table_cache = (raw, conversion, _compile_conversion(tuple(conversion.items())))
+    return cached[1], cached[2]
+
+
+def _convert_percentage(conversion, table, percentage):
+    """Percentage -> PH grade using the compiled table when there is one"""
+    if table is None:
+        return _scan_conversion(conversion, percentage)
+    
+    if not 0 <= percentage <= 100:  # also rejects NaN
+        return 5.0
+    grades, upper = table
+    idx = int(percentage)
+    # A fraction past the end of its range (e.g. 96.5) matches nothing
+    return grades[idx] if percentage <= upper[idx] else 5.0
+
+
+def _convert_percentages(conversion, table, percentages):
+    """
+    Batch version of _convert_percentage(): one vectorized lookup over the
+    compiled table (Config.percent_to_grade). Returns a list of PH grades.
+    """
+    if table is None:
+        return [_scan_conversion(conversion, p) for p in percentages]
+    
+    import numpy as np
+    
+    lookup = (np.asarray(table[0]), np.asarray(table[1]))
+    return Config.percent_to_grade(percentages, lookup).tolist()
+
 
 class User(UserMixin, db.Model):
     """
@@ -64,8 +178,10 @@ class Student(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    enrollments = db.relationship('Enrollment', backref='student', lazy='dynamic', cascade='all, delete-orphan')
-    grades = db.relationship('Grade', backref='student', lazy='dynamic', cascade='all, delete-orphan')
+    # Plain lazy collections (not 'dynamic') so callers can eager-load them
+    # with selectinload(); filter through Enrollment/Grade.query instead
+    enrollments = db.relationship('Enrollment', backref='student', cascade='all, delete-orphan')
+    grades = db.relationship('Grade', backref='student', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Student {self.student_number} - {self.get_full_name()}>'
@@ -74,9 +190,10 @@ class Student(db.Model):
         """Return full name"""
         return f"{self.first_name} {self.last_name}"
     
-    def _get_per_class_ph_grade(self, enrollment):
+    def _get_graded_classes(self, school_year=None, semester=None):
         """
-        Return the Philippine grade (1.0-5.0) for one enrollment.
+        Return [(ph_grade, units, is_major)] for each graded class, optionally
+        limited to one semester. One query, one row per enrolled class.
  
         NEW system (tests have term_tag):
             enrollment.final_grade is set by _update_enrollment_average()
@@ -87,70 +204,83 @@ class Student(db.Model):
             Fall back to averaging Grade.final_grade values per test —
             those were stored directly as PH grades in the old system.
  
-        Returns float or None (None = no grade yet, skip this class for GPA).
-        """
-        cls = enrollment.class_
+        Classes with no grade yet are left out (skipped for GPA). The final
+        sums and rounding stay in Python (_calculate_gpa) so they match
+        Python round() exactly; SQL ROUND() breaks ties differently.
  
-        # Discriminator: any tagged test means this is a new-system class
-        has_tagged = (
-            Test.query
-            .filter_by(class_id=cls.id)
-            .filter(Test.term_tag.isnot(None))
-            .first()
-        ) is not None
- 
-        if has_tagged:
-            # New system — enrollment.final_grade is the PH grade
-            return enrollment.final_grade  # None if not yet computed
- 
-        else:
-            # Old system — average per-test Grade.final_grade values
-            old_grades = (
-                Grade.query
-                .join(Test)
-                .filter(
-                    Test.class_id        == cls.id,
-                    Grade.student_id     == self.id,
-                    Grade.final_grade.isnot(None)
-                )
-                .all()
+        Memoized on flask.g for the current request, so the weighted/simple/
+        major_only variants rendered on one page share a single query.
+        """
+        from flask import g, has_app_context
+ 
+        key = (self.id, school_year, semester)
+        if has_app_context():
+            cache = g.setdefault('_gpa_graded_classes', {})
+            if key in cache:
+                return cache[key]
+ 
+        graded = [
+            (ph, units, is_major)
+            for _, ph, units, is_major in
+            self._graded_class_rows(
+                student_transcript_view.c.student_id == self.id, school_year, semester
             )
+        ]
  
-            if not old_grades:
-                return None
- 
-            return round(
-                sum(g.final_grade for g in old_grades) / len(old_grades), 2
-            )
+        if has_app_context():
+            cache[key] = graded
+        return graded
  
-    def get_semester_gpa(self, school_year, semester, calculation_method='weighted'):
+    @staticmethod
+    def _graded_class_rows(student_filter, school_year=None, semester=None):
         """
-        Calculate GPA for a specific semester.
- 
-        Reads one PH grade per enrolled class (via _get_per_class_ph_grade),
-        never raw test scores. Handles both old and new grading systems.
+        Yield (student_id, ph_grade, units, is_major) per graded class of the
+        students matched by student_filter (see _get_graded_classes()).
         """
-        enrollments = (
-            Enrollment.query
-            .filter_by(student_id=self.id)
-            .join(Class)
+        # Rows from the transcript view (enrollment + class + subject with
+        # units/is_major already resolved); the per-class grade source is
+        # picked in SQL by correlated subqueries
+        view = student_transcript_view
+        is_tagged = (
+            db.session.query(Test.id)
+            .filter(Test.class_id == view.c.class_id, Test.term_tag.isnot(None))
+            .exists()
+        )
+        old_average = (
+            db.session.query(func.avg(Grade.final_grade))
+            .join(Test, Grade.test_id == Test.id)
             .filter(
-                Class.school_year == school_year,
-                Class.semester    == semester,
+                Test.class_id == view.c.class_id,
+                Grade.student_id == view.c.student_id,
+                Grade.final_grade.isnot(None)
             )
-            .all()
+            .scalar_subquery()
         )
+        query = (
+            db.session.query(
+                view.c.student_id,
+                view.c.units,
+                view.c.is_major,
+                is_tagged.label('is_tagged'),
+                case((is_tagged, view.c.final_grade), else_=old_average).label('grade'),
+            )
+            .filter(student_filter)
+        )
+        if school_year is not None:
+            query = query.filter(
+                view.c.school_year == school_year,
+                view.c.semester    == semester,
+            )
  
-        if not enrollments:
-            return None
- 
-        # Build (ph_grade, units, is_major) for each class that has a grade
-        graded = []
-        for e in enrollments:
-            ph = self._get_per_class_ph_grade(e)
-            if ph is not None:
-                graded.append((ph, e.class_.effective_units, e.class_.is_major_subject))
+        for row in query:
+            if row.grade is None:
+                continue
+            ph = row.grade if row.is_tagged else round(row.grade, 2)
+            yield row.student_id, ph, row.units, row.is_major
  
+    @staticmethod
+    def _calculate_gpa(graded, calculation_method):
+        """Aggregate (ph_grade, units, is_major) rows into a GPA."""
         if not graded:
             return None
  
@@ -170,69 +300,46 @@ class Student(db.Model):
  
         return None
  
-    def get_cumulative_gpa(self, calculation_method='weighted'):
+    def get_semester_gpa(self, school_year, semester, calculation_method='weighted'):
         """
-        Calculate cumulative GPA across all semesters.
+        Calculate GPA for a specific semester.
  
-        Reads one PH grade per enrolled class (via _get_per_class_ph_grade),
+        Reads one PH grade per enrolled class (via _get_graded_classes),
         never raw test scores. Handles both old and new grading systems.
         """
-        enrollments = Enrollment.query.filter_by(student_id=self.id).all()
- 
-        if not enrollments:
-            return None
- 
-        # Build (ph_grade, units, is_major) for each class that has a grade
-        graded = []
-        for e in enrollments:
-            ph = self._get_per_class_ph_grade(e)
-            if ph is not None:
-                graded.append((ph, e.class_.effective_units, e.class_.is_major_subject))
- 
-        if not graded:
-            return None
- 
-        if calculation_method == 'weighted':
-            total_points = sum(ph * units for ph, units, _ in graded)
-            total_units  = sum(units      for _,  units, _ in graded)
-            return round(total_points / total_units, 2) if total_units > 0 else None
- 
-        elif calculation_method == 'simple':
-            return round(sum(ph for ph, _, _ in graded) / len(graded), 2)
+        graded = self._get_graded_classes(school_year, semester)
+        return self._calculate_gpa(graded, calculation_method)
  
-        elif calculation_method == 'major_only':
-            major = [(ph, units) for ph, units, is_major in graded if is_major]
-            if not major:
-                return None
-            return round(sum(ph for ph, _ in major) / len(major), 2)
+    def get_cumulative_gpa(self, calculation_method='weighted'):
+        """
+        Calculate cumulative GPA across all semesters.
  
-        return None
+        Reads one PH grade per enrolled class (via _get_graded_classes),
+        never raw test scores. Handles both old and new grading systems.
+        """
+        graded = self._get_graded_classes()
+        return self._calculate_gpa(graded, calculation_method)
  
+    @classmethod
+    def gpa_for_batch(cls, student_ids, school_year, semester, calculation_method='weighted'):
         """
-        Calculate cumulative GPA (all semesters)
+        Semester GPA for many students in one query.
+ 
+        Returns {student_id: gpa}; same values as get_semester_gpa(), with
+        None for students who have no graded class that semester.
         """
-        all_grades = self.grades.filter(Grade.final_grade.isnot(None)).all()
-        
-        if not all_grades:
-            return None
-        
-        if calculation_method == 'weighted':
-            total_points = sum(g.final_grade * g.test.class_.effective_units for g in all_grades)
-            total_units = sum(g.test.class_.effective_units for g in all_grades)
-            return round(total_points / total_units, 2) if total_units > 0 else None
-        
-        elif calculation_method == 'simple':
-            total = sum(g.final_grade for g in all_grades)
-            return round(total / len(all_grades), 2)
-        
-        elif calculation_method == 'major_only':
-            major_grades = [g for g in all_grades if g.test.class_.is_major_subject]
-            if not major_grades:
-                return None
-            total = sum(g.final_grade for g in major_grades)
-            return round(total / len(major_grades), 2)
-        
-        return None
+        graded = {student_id: [] for student_id in student_ids}
+        if not graded:
+            return {}
+        rows = cls._graded_class_rows(
+            student_transcript_view.c.student_id.in_(graded), school_year, semester
+        )
+        for student_id, ph, units, is_major in rows:
+            graded[student_id].append((ph, units, is_major))
+        return {
+            student_id: cls._calculate_gpa(student_rows, calculation_method)
+            for student_id, student_rows in graded.items()
+        }
 
 
 class Teacher(db.Model):
@@ -257,7 +364,7 @@ class Teacher(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    classes = db.relationship('Class', backref='teacher', lazy='dynamic')
+    classes = db.relationship('Class', backref='teacher')
     
     def __repr__(self):
         return f'<Teacher {self.employee_number} - {self.get_full_name()}>'
@@ -288,40 +395,43 @@ class Subject(db.Model):
     #   {"component": "Final", "weight": 30, "max_points": 100},
     #   {"component": "Projects", "weight": 20, "max_points": 100}
     # ]
-    grading_formula = db.Column(db.Text, nullable=True)  # JSON string
+    grading_formula = db.Column(JSONDocument, nullable=True)
     
     # Grade Conversion Table (Percentage to PH Grade)
     # Standard: 97-100=1.0, 94-96=1.25, 91-93=1.5, etc.
-    grade_conversion = db.Column(db.Text, nullable=True)  # JSON string
+    grade_conversion = db.Column(JSONDocument, nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    classes = db.relationship('Class', backref='subject', lazy='dynamic')
+    # Class.subject loads 'selectin' so listing classes costs one extra query
+    # instead of one per class (effective_* properties, __repr__, GPA).
+    # Not 'joined': that would widen every Class SELECT even when no subject
+    # is linked, which is the case for manually entered classes.
+    classes = db.relationship('Class', backref=db.backref('subject', lazy='selectin'))
+    
+    # (raw column, conversion, compiled table) - see _conversion_table()
+    _table_cache = None
     
     def __repr__(self):
         return f'<Subject {self.code} - {self.name}>'
     
     def get_grading_formula(self):
-        """Parse and return grading formula as list"""
+        """Return grading formula as list"""
         if self.grading_formula:
-            return json.loads(self.grading_formula)
+            return self.grading_formula
         return []
     
     def set_grading_formula(self, formula_list):
         """Set grading formula from list"""
-        self.grading_formula = json.dumps(formula_list)
+        self.grading_formula = formula_list
     
     def get_grade_conversion(self):
-        """Parse and return grade conversion table"""
+        """Return grade conversion table"""
         if self.grade_conversion:
-            return json.loads(self.grade_conversion)
+            return self.grade_conversion
         # Default PH grading scale
-        return {
-            "97-100": 1.0, "94-96": 1.25, "91-93": 1.5, "88-90": 1.75,
-            "85-87": 2.0, "82-84": 2.25, "79-81": 2.5, "76-78": 2.75,
-            "75": 3.0, "65-74": 4.0, "0-64": 5.0
-        }
+        return DEFAULT_GRADE_CONVERSION
     
     def convert_to_ph_grade(self, percentage):
         """
@@ -333,18 +443,13 @@ class Subject(db.Model):
         Returns:
             float: PH grade (1.0 - 5.0)
         """
-        conversion = self.get_grade_conversion()
-        
-        for range_str, grade in conversion.items():
-            if '-' in range_str:
-                min_score, max_score = map(int, range_str.split('-'))
-                if min_score <= percentage <= max_score:
-                    return grade
-            else:
-                if percentage == int(range_str):
-                    return grade
-        
-        return 5.0  # Failed if no match
+        conversion, table = _conversion_table(self, self.grade_conversion, self.get_grade_conversion)
+        return _convert_percentage(conversion, table, percentage)
+    
+    def convert_to_ph_grades(self, percentages):
+        """Convert many percentages at once (list in, list of PH grades out)"""
+        conversion, table = _conversion_table(self, self.grade_conversion, self.get_grade_conversion)
+        return _convert_percentages(conversion, table, percentages)
 
 
 class Class(db.Model):
@@ -353,6 +458,13 @@ class Class(db.Model):
     UPDATED: Grading formula no longer requires max_points (for Option B)
     """
     __tablename__ = 'class'
+    __table_args__ = (
+        # Teacher dashboard/analytics filter by teacher + academic period
+        db.Index('ix_class_teacher_year_sem', 'teacher_id', 'school_year', 'semester'),
+        # Semester GPA joins enrollments to the classes of one period
+        db.Index('ix_class_year_sem', 'school_year', 'semester'),
+        db.Index('ix_class_subject', 'subject_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -361,6 +473,9 @@ class Class(db.Model):
     subject_name = db.Column(db.String(200), nullable=True)
     subject_code = db.Column(db.String(20), nullable=True)
     units = db.Column(db.Integer, nullable=True)
+    # Copied from Subject.is_major_subject (kept in sync by the listeners
+    # below) so GPA reads don't have to chase Class -> Subject
+    is_major = db.Column(db.Boolean, nullable=True)
     
     # === TEACHER & CLASS DETAILS ===
     teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
@@ -374,6 +489,9 @@ class Class(db.Model):
     
     # === CLASS LIMITS ===
     max_students = db.Column(db.Integer, default=40)
+    # Students with status 'enrolled' - maintained by the Enrollment
+    # listeners below, repaired by recount_enrollments()
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # === GRADING FORMULA ===
     # NEW FORMAT (Option B - max_points optional):
@@ -393,8 +511,8 @@ class Class(db.Model):
     #     {"name": "Quizzes", "weight": 30, "max_points": 100}
     #   ]
     # }
-    grading_formula = db.Column(db.Text, nullable=True)
-    grade_conversion_table = db.Column(db.Text, nullable=True)
+    grading_formula = db.Column(JSONDocument, nullable=True)
+    grade_conversion_table = db.Column(JSONDocument, nullable=True)
     
     # === PROGRAM/YEAR ===
     department = db.Column(db.String(100), nullable=True)
@@ -404,8 +522,15 @@ class Class(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # === RELATIONSHIPS ===
-    enrollments = db.relationship('Enrollment', backref='class_', lazy='dynamic', cascade='all, delete-orphan')
-    tests = db.relationship('Test', backref='class_', lazy='dynamic', cascade='all, delete-orphan')
+    enrollments = db.relationship('Enrollment', backref='class_', cascade='all, delete-orphan')
+    tests = db.relationship('Test', backref='class_', cascade='all, delete-orphan')
+    
+    # (subject formula, formula built from it) for classes without their own
+    _subject_formula_cache = None
+    # (raw column, conversion, compiled table) - see _conversion_table()
+    _table_cache = None
+    # (formula, flattened components) - see get_formula_components()
+    _components_cache = None
     
     # === HELPER PROPERTIES ===
     
@@ -439,6 +564,8 @@ class Class(db.Model):
     @property
     def is_major_subject(self):
         """Check if this is a major subject (for GPA calculation)"""
+        if self.is_major is not None:
+            return self.is_major
         if self.subject_id and self.subject:
             return self.subject.is_major_subject
         return True
@@ -452,34 +579,49 @@ class Class(db.Model):
         """
         # Priority 1: Class has its own formula
         if self.grading_formula:
-            try:
-                return json.loads(self.grading_formula)
-            except json.JSONDecodeError:
-                pass
+            return self.grading_formula
         
         # Priority 2: Old class - get from Subject table
+        # (memoized until the subject's formula value changes)
         if self.subject_id and self.subject and self.subject.grading_formula:
-            try:
-                formula = json.loads(self.subject.grading_formula)
-                if 'components' in formula:
-                    return formula
-                return {
+            formula = self.subject.get_grading_formula()
+            cached = self._subject_formula_cache
+            if cached is not None and cached[0] is formula:
+                return cached[1]
+            if 'components' in formula:
+                result = formula
+            else:
+                result = {
                     "components": formula if isinstance(formula, list) else [],
                     "passing_grade": 3.0,
                     "use_philippine_conversion": True
                 }
-            except (json.JSONDecodeError, AttributeError):
-                pass
+            self._subject_formula_cache = (formula, result)
+            return result
         
         # Priority 3: Default formula (Option B - no max_points)
-        return {
-            "components": [
-                {"name": "Midterm Exam", "weight": 50},
-                {"name": "Final Exam", "weight": 50}
-            ],
-            "passing_grade": 3.0,
-            "use_philippine_conversion": True
-        }
+        return DEFAULT_GRADING_FORMULA
+    
+    def get_formula_components(self):
+        """
+        Grading formula components as a tuple of (name, weight, max_points)
+        
+        Grade calculation walks this instead of the formula dicts. Memoized
+        until the formula value changes; None when the formula has no
+        'components' key.
+        """
+        formula = self.get_grading_formula()
+        cached = self._components_cache
+        if cached is None or cached[0] is not formula:
+            if not formula or 'components' not in formula:
+                components = None
+            else:
+                components = tuple(
+                    (c['name'], c['weight'], c.get('max_points', 100))
+                    for c in formula['components']
+                )
+            cached = self._components_cache = (formula, components)
+        return cached[1]
     
     def set_grading_formula(self, formula_dict):
         """
@@ -502,7 +644,7 @@ class Class(db.Model):
             # Note: max_points is optional with Option B
         
         # Validate weights total 100%
-        total_weight = sum(c.get('weight', 0) for c in formula_dict['components'])
+        total_weight = formula_weight_total(formula_dict['components'])
         if total_weight != 100:
             raise ValueError(f"Component weights must total 100%, got {total_weight}%")
         
@@ -513,7 +655,7 @@ class Class(db.Model):
         if 'use_philippine_conversion' not in formula_dict:
             formula_dict['use_philippine_conversion'] = True
         
-        self.grading_formula = json.dumps(formula_dict)
+        self.grading_formula = formula_dict
     
     def validate_formula_weights(self):
         """Check if formula weights total 100%"""
@@ -522,75 +664,121 @@ class Class(db.Model):
             if not formula or 'components' not in formula:
                 return False
             
-            total_weight = sum(c.get('weight', 0) for c in formula['components'])
-            return total_weight == 100
+            return formula_weight_total(formula['components']) == 100
         except:
             return False
     
     def has_grading_formula(self):
-        """Check if class has a grading formula set"""
-        return self.grading_formula is not None or (
-            self.subject_id and self.subject and self.subject.grading_formula
-        )
+        """
+        Check if class has a grading formula set
+        
+        The class's own column is checked first, so the subject is only
+        consulted for classes without one (and it is selectin-loaded with
+        the class, so listing classes doesn't query per row).
+        """
+        if self.grading_formula is not None:
+            return True
+        return bool(self.subject_id and self.subject and self.subject.grading_formula)
     
     def can_edit_formula(self):
         """
         Check if formula can be edited
         Returns True only if no grades have been entered yet
         """
-        from models import Grade, Test
-        grades_count = Grade.query.join(Test).filter(
-            Test.class_id == self.id,
-            Grade.final_grade.isnot(None)
-        ).count()
+        # EXISTS stops at the first graded row instead of counting them all
+        has_grades = db.session.query(
+            Grade.query.join(Test).filter(
+                Test.class_id == self.id,
+                Grade.final_grade.isnot(None)
+            ).exists()
+        ).scalar()
         
-        return grades_count == 0
+        return not has_grades
+    
+    def recalculate_grades(self):
+        """
+        Re-run the formula for every untagged (Method 1) grade in this class,
+        e.g. after the formula changed. One SELECT, one vectorized pass
+        (Grade.bulk_recalculate) and one executemany UPDATE by primary key.
+        Tagged grades are per-term and recomputed by the grading routes.
+        
+        The UPDATE bypasses the unit of work, so Grade mapper events do not
+        run (updated_at is still bumped by its trigger). The caller commits.
+        
+        Returns the number of grades recalculated.
+        """
+        grades = (
+            Grade.query
+            .join(Test)
+            .filter(
+                Test.class_id == self.id,
+                Test.term_tag.is_(None),
+                Grade.component_scores.isnot(None)
+            )
+            .options(contains_eager(Grade.test))
+            .all()
+        )
+        Grade.bulk_recalculate(grades, self)
+        
+        columns = ('calculated_percentage', 'calculated_grade', 'final_grade')
+        mappings = []
+        for grade in grades:
+            if not db.session.is_modified(grade):
+                continue
+            values = {column: getattr(grade, column) for column in columns}
+            mappings.append({'id': grade.id, **values})
+            # Mark the new values as persisted so the next flush skips this row
+            for column, value in values.items():
+                set_committed_value(grade, column, value)
+        if mappings:
+            db.session.execute(update(Grade), mappings)
+        return len(grades)
     
     def get_grade_conversion_table(self):
         """Get grade conversion table (percentage to PH grade)"""
         if self.grade_conversion_table:
-            try:
-                return json.loads(self.grade_conversion_table)
-            except json.JSONDecodeError:
-                pass
+            return self.grade_conversion_table
         
         # Default Philippine grading scale
-        return {
-            "97-100": 1.0,
-            "94-96": 1.25,
-            "91-93": 1.5,
-            "88-90": 1.75,
-            "85-87": 2.0,
-            "82-84": 2.25,
-            "79-81": 2.5,
-            "76-78": 2.75,
-            "75": 3.0,
-            "65-74": 4.0,
-            "0-64": 5.0
-        }
+        return DEFAULT_GRADE_CONVERSION
     
     def convert_to_ph_grade(self, percentage):
         """Convert percentage score to Philippine grade"""
-        conversion = self.get_grade_conversion_table()
-        
-        for range_str, grade in conversion.items():
-            if '-' in range_str:
-                min_score, max_score = map(int, range_str.split('-'))
-                if min_score <= percentage <= max_score:
-                    return grade
-            else:
-                if percentage == int(range_str):
-                    return grade
-        
-        return 5.0  # Failed if no match
+        conversion, table = _conversion_table(self, self.grade_conversion_table, self.get_grade_conversion_table)
+        return _convert_percentage(conversion, table, percentage)
+    
+    def convert_to_ph_grades(self, percentages):
+        """Convert many percentages at once (list in, list of PH grades out)"""
+        conversion, table = _conversion_table(self, self.grade_conversion_table, self.get_grade_conversion_table)
+        return _convert_percentages(conversion, table, percentages)
     
     def __repr__(self):
         section_str = f" - Section {self.section}" if self.section else ""
-        return f'<Class {self.effective_subject_code}{section_str} ({self.school_year} {self.semester})>'
+        # Don't lazy-load the Subject just to log/print a class
+        if self.subject_code or not self.subject_id or 'subject' not in inspect(self).unloaded:
+            code = self.effective_subject_code
+        else:
+            code = f"subject_id={self.subject_id}"
+        return f'<Class {code}{section_str} ({self.school_year} {self.semester})>'
     
     def get_enrolled_count(self):
         """Get number of enrolled students"""
-        return self.enrollments.filter_by(status='enrolled').count()
+        return self.enrolled_count or 0
+    
+    @staticmethod
+    def recount_enrollments():
+        """
+        Recompute enrolled_count for every class from the enrollment table.
+        Repairs drift from writes that bypass the ORM (bulk/Core inserts,
+        manual SQL). Run by `flask recount-enrollments`.
+        """
+        enrolled = (
+            db.select(func.count(Enrollment.id))
+            .where(Enrollment.class_id == Class.id, Enrollment.status == 'enrolled')
+            .scalar_subquery()
+        )
+        db.session.execute(update(Class).values(enrolled_count=enrolled))
+        db.session.commit()
     
     def is_full(self):
         """Check if class is at capacity"""
@@ -604,18 +792,64 @@ class Class(db.Model):
         return f"{code}: {name}{section}"
 
 
+@event.listens_for(Class, 'before_insert')
+def _copy_subject_fields(mapper, connection, target):
+    """Denormalize units/is_major from the linked Subject on insert"""
+    if target.subject_id is None or (target.units is not None and target.is_major is not None):
+        return
+    row = connection.execute(
+        db.select(Subject.units, Subject.is_major_subject)
+        .where(Subject.id == target.subject_id)
+    ).first()
+    if row is None:
+        return
+    if target.units is None:
+        target.units = row.units
+    if target.is_major is None:
+        target.is_major = row.is_major_subject
+
+
+@event.listens_for(Subject, 'after_update')
+def _cascade_subject_fields(mapper, connection, target):
+    """Push Subject units/is_major changes down to its classes"""
+    state = inspect(target)
+    values = {}
+    if state.attrs.units.history.has_changes():
+        values['units'] = target.units
+    if state.attrs.is_major_subject.history.has_changes():
+        values['is_major'] = target.is_major_subject
+    
+    # Subject stays the source of truth for subject-linked classes
+    # (manually entered classes have no subject_id)
+    if values:
+        connection.execute(
+            update(Class).where(Class.subject_id == target.id).values(**values)
+        )
+
+
 class Enrollment(db.Model):
     """
     Enrollment - Links students to classes (many-to-many relationship)
     """
     __tablename__ = 'enrollment'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_id', name='uq_enrollment_student_class'),
+        db.Index('ix_enrollment_class_status', 'class_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False, index=True)
-    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False, index=True)
+    # active_history: the enrolled_count listeners need the previous values
+    class_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False, index=True),
+        active_history=True
+    )
     
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='enrolled')  # 'enrolled', 'dropped', 'completed'
+    status = db.column_property(
+        db.Column(db.String(20), default='enrolled'),  # 'enrolled', 'dropped', 'completed'
+        active_history=True
+    )
     
     # Final grade for this class (computed at end of semester)
     final_grade = db.Column(db.Float, nullable=True)
@@ -624,6 +858,42 @@ class Enrollment(db.Model):
         return f'<Enrollment Student:{self.student_id} Class:{self.class_id} ({self.status})>'
 
 
+def _adjust_enrolled_count(connection, class_id, delta):
+    connection.execute(
+        update(Class)
+        .where(Class.id == class_id)
+        .values(enrolled_count=Class.enrolled_count + delta)
+    )
+
+
+@event.listens_for(Enrollment, 'after_insert')
+def _enrollment_inserted(mapper, connection, target):
+    if target.status == 'enrolled':
+        _adjust_enrolled_count(connection, target.class_id, 1)
+
+
+@event.listens_for(Enrollment, 'after_update')
+def _enrollment_updated(mapper, connection, target):
+    state = inspect(target)
+    status_hist = state.attrs.status.history
+    class_hist = state.attrs.class_id.history
+    if not (status_hist.has_changes() or class_hist.has_changes()):
+        return
+    
+    old_status = (status_hist.deleted or status_hist.unchanged or [None])[0]
+    old_class = (class_hist.deleted or [target.class_id])[0]
+    if old_status == 'enrolled':
+        _adjust_enrolled_count(connection, old_class, -1)
+    if target.status == 'enrolled':
+        _adjust_enrolled_count(connection, target.class_id, 1)
+
+
+@event.listens_for(Enrollment, 'after_delete')
+def _enrollment_deleted(mapper, connection, target):
+    if target.status == 'enrolled':
+        _adjust_enrolled_count(connection, target.class_id, -1)
+
+
 class Test(db.Model):
     """
     Test — A single gradable activity in a class.
@@ -650,6 +920,9 @@ class Test(db.Model):
     """
  
     __tablename__ = 'test'
+    __table_args__ = (
+        db.Index('ix_test_class', 'class_id'),
+    )
  
     id         = db.Column(db.Integer, primary_key=True)
     class_id   = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False)
@@ -665,7 +938,7 @@ class Test(db.Model):
  
     # Relationships
     grades = db.relationship(
-        'Grade', backref='test', lazy='dynamic', cascade='all, delete-orphan'
+        'Grade', backref='test', cascade='all, delete-orphan'
     )
  
     # ── Helpers ────────────────────────────────────────────────────────────
@@ -697,6 +970,25 @@ class Grade(db.Model):
     BACKWARD COMPATIBLE: Still works with old single-value format (Option A)
     """
     __tablename__ = 'grade'
+    __table_args__ = (
+        db.UniqueConstraint('test_id', 'student_id', name='uq_grade_test_student'),
+        # Partial index: aggregates only ever look at graded rows
+        db.Index(
+            'ix_grade_final', 'test_id',
+            postgresql_where=db.text('final_grade IS NOT NULL'),
+            sqlite_where=db.text('final_grade IS NOT NULL')
+        ),
+        # Covers the per-student GPA lookups (student -> test -> grade)
+        db.Index(
+            'ix_grade_student_final', 'student_id', 'test_id', 'final_grade',
+            postgresql_where=db.text('final_grade IS NOT NULL'),
+            sqlite_where=db.text('final_grade IS NOT NULL')
+        ),
+        # Server-side filtering on component names/values (PostgreSQL only)
+        db.Index(
+            'ix_grade_comp_gin', 'component_scores', postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False)
@@ -716,7 +1008,7 @@ class Grade(db.Model):
     #   "Exams": 87.5,
     #   "Quizzes": 85
     # }
-    component_scores = db.Column(db.Text, nullable=True)
+    component_scores = db.Column(JSONDocument, nullable=True)
     raw_score = db.Column(db.Float, nullable=True)
     max_score = db.Column(db.Float, nullable=True)
     
@@ -736,24 +1028,55 @@ class Grade(db.Model):
     graded_by = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=True)
     graded_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped by the grade_updated_at trigger on every UPDATE (see below), so
+    # bulk updates don't compute or send it per row
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
     
     def __repr__(self):
         return f'<Grade Student:{self.student_id} Test:{self.test_id} Grade:{self.final_grade}>'
     
+    @classmethod
+    def query_with_class(cls):
+        """
+        Grade query that loads each grade's test and class in the same
+        SELECT, for code that goes on to use grade.test.class_ (e.g. to
+        recalculate with the class formula)
+        """
+        return cls.query.options(joinedload(cls.test).joinedload(Test.class_))
+    
+    @classmethod
+    def get_or_create(cls, test_id, student_id, graded_by=None):
+        """
+        Get a student's grade for a test, adding a new one to the session if
+        there is none yet (the lookup is a seek on uq_grade_test_student)
+        """
+        grade = cls.query.filter_by(test_id=test_id, student_id=student_id).first()
+        if grade is None:
+            grade = cls(test_id=test_id, student_id=student_id, graded_by=graded_by)
+            db.session.add(grade)
+        return grade
+    
     def get_component_scores(self):
-        """Parse and return component scores as dict"""
-        if self.component_scores:
-            try:
-                return json.loads(self.component_scores)
-            except json.JSONDecodeError:
-                return {}
+        """
+        Return component scores as dict
+        
+        A copy - callers edit it and hand it back to set_component_scores(),
+        and the JSON column only notices a new value, not in-place changes.
+        """
+        return copy.deepcopy(self._scores_view())
+    
+    def _scores_view(self):
+        """
+        Component scores as stored (parsed once when the row loads), without
+        get_component_scores()'s copy. Read-only - never mutate the result.
+        """
+        if isinstance(self.component_scores, dict):
+            return self.component_scores
         return {}
     
     def set_component_scores(self, scores_dict):
         """Set component scores from dict"""
-        self.component_scores = json.dumps(scores_dict)
-        self.updated_at = datetime.utcnow()
+        self.component_scores = scores_dict
     
     def add_component_item(self, component_name, score, max_score, item_name, item_date=None):
         """
@@ -772,6 +1095,72 @@ class Grade(db.Model):
         Raises:
             ValueError: If validation fails
         """
+        new_item = self._build_component_item(score, max_score, item_name, item_date)
+        
+        # Get current scores - a shallow copy; only the edited component's
+        # list is copied, the stored value itself is never mutated
+        scores = dict(self._scores_view())
+        items = scores.get(component_name)
+        
+        # Initialize component as list if it doesn't exist, or if it's
+        # old format (single value)
+        items = list(items) if isinstance(items, list) else []
+        
+        # Add to list
+        items.append(new_item)
+        scores[component_name] = items
+        
+        # Save
+        self.set_component_scores(scores)
+        
+        return new_item
+    
+    def add_component_items(self, component_name, items):
+        """
+        Add several quizzes/exams/tasks to a component category at once
+        
+        Every item is validated before anything is stored, so a bad item
+        leaves the component untouched, and the scores are saved once.
+        All invalid items are reported together in one ValueError.
+        
+        Args:
+            component_name: e.g., "Quizzes", "Exams"
+            items: Iterable of dicts with 'score', 'max', 'name' and an
+                optional 'date'
+        
+        Returns:
+            list: The newly added items
+        
+        Raises:
+            ValueError: If validation fails for any item
+        """
+        new_items = []
+        errors = []
+        for index, item in enumerate(items, 1):
+            try:
+                new_items.append(self._build_component_item(
+                    item.get('score'), item.get('max'), item.get('name'), item.get('date')
+                ))
+            except ValueError as e:
+                errors.append(f"Item {index}: {e}")
+        
+        if errors:
+            raise ValueError('; '.join(errors))
+        
+        scores = dict(self._scores_view())
+        existing = scores.get(component_name)
+        existing = list(existing) if isinstance(existing, list) else []
+        
+        existing.extend(new_items)
+        scores[component_name] = existing
+        
+        self.set_component_scores(scores)
+        
+        return new_items
+    
+    @staticmethod
+    def _build_component_item(score, max_score, item_name, item_date=None):
+        """Validate one item's fields and return it as a stored item dict"""
         # Validation
         if score is None or max_score is None:
             raise ValueError("Score and max_score are required")
@@ -788,32 +1177,12 @@ class Grade(db.Model):
         if not item_name or not item_name.strip():
             raise ValueError("Item name is required")
         
-        # Get current scores
-        scores = self.get_component_scores()
-        
-        # Initialize component as list if it doesn't exist
-        if component_name not in scores:
-            scores[component_name] = []
-        
-        # Convert to list if it's old format (single value)
-        if not isinstance(scores[component_name], list):
-            scores[component_name] = []
-        
-        # Create new item
-        new_item = {
+        return {
             'score': float(score),
             'max': float(max_score),
             'name': item_name.strip(),
             'date': item_date if item_date else datetime.utcnow().strftime('%Y-%m-%d')
         }
-        
-        # Add to list
-        scores[component_name].append(new_item)
-        
-        # Save
-        self.set_component_scores(scores)
-        
-        return new_item
     
     def get_component_items(self, component_name):
         """
@@ -825,14 +1194,14 @@ class Grade(db.Model):
         Returns:
             list: List of items, empty list if none exist
         """
-        scores = self.get_component_scores()
-        items = scores.get(component_name, [])
+        items = self._scores_view().get(component_name, [])
         
         # Handle old format (single value)
         if not isinstance(items, list):
             return []
         
-        return items
+        # A copy of this component only, not of every component's items
+        return copy.deepcopy(items)
     
     def update_component_item(self, component_name, item_index, score=None, max_score=None, item_name=None, item_date=None):
         """
@@ -852,17 +1221,19 @@ class Grade(db.Model):
         Raises:
             ValueError: If validation fails
         """
-        scores = self.get_component_scores()
+        # Shallow copies down to the edited item (see add_component_item)
+        scores = dict(self._scores_view())
+        items = scores.get(component_name)
         
         # Check if component exists and is a list
-        if component_name not in scores or not isinstance(scores[component_name], list):
+        if not isinstance(items, list):
             return False
         
         # Check if index is valid
-        if not (0 <= item_index < len(scores[component_name])):
+        if not (0 <= item_index < len(items)):
             return False
         
-        item = scores[component_name][item_index]
+        item = dict(items[item_index])
         
         # Update fields if provided
         if score is not None:
@@ -888,6 +1259,9 @@ class Grade(db.Model):
             item['date'] = item_date
         
         # Save
+        items = list(items)
+        items[item_index] = item
+        scores[component_name] = items
         self.set_component_scores(scores)
         
         return True
@@ -903,18 +1277,22 @@ class Grade(db.Model):
         Returns:
             bool: True if successful, False if item not found
         """
-        scores = self.get_component_scores()
+        # Shallow copies (see add_component_item)
+        scores = dict(self._scores_view())
+        items = scores.get(component_name)
         
         # Check if component exists and is a list
-        if component_name not in scores or not isinstance(scores[component_name], list):
+        if not isinstance(items, list):
             return False
         
         # Check if index is valid
-        if not (0 <= item_index < len(scores[component_name])):
+        if not (0 <= item_index < len(items)):
             return False
         
         # Delete the item
-        del scores[component_name][item_index]
+        items = list(items)
+        del items[item_index]
+        scores[component_name] = items
         
         # Save
         self.set_component_scores(scores)
@@ -1133,43 +1511,21 @@ class Grade(db.Model):
             return self.calculate_grade_v2(class_obj, self.test.term_tag)
     
         # ── Method 1: untagged test (backward compat) ─────────────────────────
-        component_data = self.get_component_scores()
-        formula = class_obj.get_grading_formula()
+        component_data = self._scores_view()
+        components = class_obj.get_formula_components()
     
-        if not component_data or not formula or 'components' not in formula:
+        if not component_data or components is None:
             return
     
         total_weighted = 0
         total_weight   = 0
     
-        for component in formula['components']:
-            comp_name = component['name']
-            weight    = component['weight']
-    
+        for comp_name, weight, max_points in components:
             if comp_name not in component_data:
                 continue
     
-            items = component_data[comp_name]
-    
-            if isinstance(items, list):
-                if len(items) == 0:
-                    continue
-                percentages = []
-                for item in items:
-                    if not isinstance(item, dict):
-                        continue
-                    score     = item.get('score')
-                    max_score = item.get('max')
-                    if score is None or max_score is None or max_score == 0:
-                        continue
-                    percentages.append((score / max_score) * 100)
-                if percentages:
-                    avg_pct = sum(percentages) / len(percentages)
-                    total_weighted += avg_pct * weight / 100
-                    total_weight   += weight
-            else:
-                max_points = component.get('max_points', 100)
-                avg_pct    = (items / max_points) * 100
+            avg_pct = self._component_percentage(component_data[comp_name], max_points)
+            if avg_pct is not None:
                 total_weighted += avg_pct * weight / 100
                 total_weight   += weight
     
@@ -1188,6 +1544,97 @@ class Grade(db.Model):
             if not self.is_overridden:
                 self.final_grade = None
     
+    @staticmethod
+    def _component_percentage(items, max_points):
+        """
+        Average percentage for one formula component (Method 1)
+        
+        items is either a list of {"score", "max"} dicts (Option B) or a single
+        raw score out of the component's max_points (Option A). Returns None
+        when the list has no usable items.
+        """
+        if isinstance(items, list):
+            percentages = []
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                score     = item.get('score')
+                max_score = item.get('max')
+                if score is None or max_score is None or max_score == 0:
+                    continue
+                percentages.append((score / max_score) * 100)
+            if not percentages:
+                return None
+            return sum(percentages) / len(percentages)
+        
+        return (items / max_points) * 100
+    
+    @classmethod
+    def bulk_recalculate(cls, grades, class_obj):
+        """
+        Recalculate many grades of one class at once
+        
+        Gives the same results as calling calculate_grade() on each grade,
+        but the formula and conversion table are parsed once and the
+        weighting and PH conversion run as NumPy array operations. Tagged
+        (Method 2) grades still go through calculate_grade_v2() one by one.
+        
+        Args:
+            grades: Grade rows for tests of class_obj
+            class_obj: Class the grades belong to
+        """
+        import numpy as np
+        
+        untagged = []
+        for grade in grades:
+            if grade.test and grade.test.is_tagged:
+                grade.calculate_grade_v2(class_obj, grade.test.term_tag)
+            else:
+                untagged.append(grade)
+        
+        components = class_obj.get_formula_components()
+        if not untagged or components is None:
+            return
+        
+        # Grades without component data are left untouched (as in calculate_grade)
+        scored = [(grade, grade._scores_view()) for grade in untagged]
+        scored = [(grade, component_data) for grade, component_data in scored if component_data]
+        if not scored:
+            return
+        
+        # pct[i, j] = average percentage of component j for grade i (NaN = no data)
+        pct = np.array([
+            [
+                cls._component_percentage(component_data[name], max_points)
+                if name in component_data else None
+                for name, _, max_points in components
+            ]
+            for _, component_data in scored
+        ], dtype=np.float64)
+        
+        weights = np.array([weight for _, weight, _ in components], dtype=np.float64)
+        has_score = ~np.isnan(pct)
+        total_weighted = np.where(has_score, pct * weights / 100, 0.0).sum(axis=1)
+        total_weight = np.where(has_score, weights, 0.0).sum(axis=1)
+        
+        # Python round() to match calculate_grade() exactly (np.round differs)
+        percentages = [round(float(t), 2) for t in total_weighted]
+        ph_grades = class_obj.convert_to_ph_grades(percentages)
+        
+        for (grade, _), weight, percentage, ph_grade in zip(scored, total_weight, percentages, ph_grades):
+            if weight > 0:
+                grade.calculated_percentage = percentage
+                grade.calculated_grade = ph_grade
+                if grade.is_overridden and grade.override_grade:
+                    grade.final_grade = grade.override_grade
+                else:
+                    grade.final_grade = ph_grade
+            else:
+                grade.calculated_percentage = None
+                grade.calculated_grade      = None
+                if not grade.is_overridden:
+                    grade.final_grade = None
+    
     def set_override(self, grade, reason, teacher_id):
         """
         Manually override the calculated grade
@@ -1211,6 +1658,30 @@ class Grade(db.Model):
         self.override_reason = None
         self.final_grade = self.calculated_grade
 
+# Grade.updated_at triggers - the migration creates these; the listeners
+# cover create_all() setups. PostgreSQL stamps NEW in a BEFORE trigger;
+# SQLite has no such form, so it re-stamps the row AFTER (recursive triggers
+# are off by default, so this doesn't loop).
+event.listen(Grade.__table__, 'after_create', DDL("""
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := timezone('utc', now());
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+""").execute_if(dialect='postgresql'))
+event.listen(Grade.__table__, 'after_create', DDL("""
+CREATE TRIGGER grade_updated_at BEFORE UPDATE ON grade
+FOR EACH ROW EXECUTE FUNCTION set_updated_at()
+""").execute_if(dialect='postgresql'))
+event.listen(Grade.__table__, 'after_create', DDL("""
+CREATE TRIGGER grade_updated_at AFTER UPDATE ON grade
+FOR EACH ROW BEGIN
+    UPDATE grade SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END
+""").execute_if(dialect='sqlite'))
+
+
 class TestPaperImage(db.Model):
     """
     TestPaperImage — Stores uploaded test paper images from the AI pipeline.
@@ -1424,20 +1895,50 @@ class SystemSettings(db.Model):
         Set a setting value in database
         Creates new setting if doesn't exist
         """
-        setting = SystemSettings.query.filter_by(setting_key=key).first()
-        if setting:
-            setting.setting_value = value
-            setting.updated_at = datetime.utcnow()
-            setting.updated_by = updated_by
-        else:
-            setting = SystemSettings(
-                setting_key=key,
-                setting_value=value,
-                updated_by=updated_by
+        return SystemSettings.set_settings_bulk({key: value}, updated_by)[key]
+    
+    @staticmethod
+    def set_settings_bulk(items, updated_by=None):
+        """
+        Set several setting values in one transaction
+        
+        Existing rows are looked up with a single IN query, missing ones are
+        created, and everything is committed once.
+        
+        Args:
+            items: dict of {setting_key: setting_value}
+            updated_by: Email of admin making the change
+        
+        Returns:
+            dict: {setting_key: SystemSettings}
+        """
+        settings = {
+            setting.setting_key: setting
+            for setting in SystemSettings.query.filter(
+                SystemSettings.setting_key.in_(list(items))
             )
-            db.session.add(setting)
+        }
+        
+        now = datetime.utcnow()
+        for key, value in items.items():
+            setting = settings.get(key)
+            if setting:
+                setting.setting_value = value
+                setting.updated_at = now
+                setting.updated_by = updated_by
+            else:
+                setting = SystemSettings(
+                    setting_key=key,
+                    setting_value=value,
+                    updated_by=updated_by
+                )
+                db.session.add(setting)
+                settings[key] = setting
         db.session.commit()
-        return setting
+        
+        from config import Config
+        Config.clear_settings_cache()
+        return settings
     
     @staticmethod
     def delete_setting(key):
@@ -1446,5 +1947,59 @@ class SystemSettings(db.Model):
         if setting:
             db.session.delete(setting)
             db.session.commit()
+            
+            from config import Config
+            Config.clear_settings_cache()
             return True
-        return False
\ No newline at end of file
+        return False
+
+# Read-only view: one row per enrollment with its class/subject fields joined
+# and subject code/name, units and is_major resolved the way the Class
+# effective_* properties and is_major_subject do (the class's own value
+# first). Used for transcript/GPA reads.
+#
+# Kept out of db.metadata so create_all() and autogenerate never build it as a
+# table. Migrations create the view; the listeners cover create_all() setups.
+TRANSCRIPT_VIEW_SQL = """
+CREATE VIEW student_transcript_view AS
+SELECT
+    e.id          AS enrollment_id,
+    e.student_id  AS student_id,
+    e.class_id    AS class_id,
+    e.status      AS status,
+    e.final_grade AS final_grade,
+    c.school_year AS school_year,
+    c.semester    AS semester,
+    COALESCE(NULLIF(c.subject_code, ''), s.code) AS subject_code,
+    COALESCE(NULLIF(c.subject_name, ''), s.name) AS subject_name,
+    COALESCE(c.units, s.units, 3) AS units,
+    CASE
+        WHEN c.is_major IS NOT NULL THEN c.is_major
+        WHEN s.id IS NOT NULL THEN s.is_major_subject
+        ELSE TRUE
+    END AS is_major
+FROM enrollment e
+JOIN "class" c ON c.id = e.class_id
+LEFT JOIN subject s ON s.id = c.subject_id
+"""
+
+student_transcript_view = Table(
+    'student_transcript_view', MetaData(),
+    Column('enrollment_id', db.Integer, primary_key=True),
+    Column('student_id', db.Integer),
+    Column('class_id', db.Integer),
+    Column('status', db.String(20)),
+    Column('final_grade', db.Float),
+    Column('school_year', db.String(20)),
+    Column('semester', db.String(20)),
+    Column('subject_code', db.String(20)),
+    Column('subject_name', db.String(200)),
+    Column('units', db.Integer),
+    Column('is_major', db.Boolean),
+)
+
+# Tied to the enrollment table (created after class and subject, dropped
+# before them) so the view is only created along with that table, not on
+# every create_all()
+event.listen(Enrollment.__table__, 'after_create', DDL(TRANSCRIPT_VIEW_SQL))
+event.listen(Enrollment.__table__, 'before_drop', DDL('DROP VIEW IF EXISTS student_transcript_view'))
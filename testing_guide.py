@@ -23,130 +23,38 @@ def example_add_grades_option_b():
     class_obj = test.class_
     
     # Create or get the grade entry for this student
-    grade = Grade.query.filter_by(
-        student_id=student.id,
-        test_id=test.id
-    ).first()
-    
-    if not grade:
-        grade = Grade(student_id=student.id, test_id=test.id)
-        db.session.add(grade)
-    
-    # Week 2: Add Quiz 1
-    try:
-        grade.add_component_item(
-            component_name="Quizzes",
-            score=20,
-            max_score=25,
-            item_name="Quiz 1",
-            item_date="2024-09-05"
-        )
-        print("✓ Quiz 1 added: 20/25")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
-    
-    # Week 5: Add Quiz 2 (different max score)
-    try:
-        grade.add_component_item(
-            component_name="Quizzes",
-            score=25,
-            max_score=30,
-            item_name="Quiz 2",
-            item_date="2024-09-25"
-        )
-        print("✓ Quiz 2 added: 25/30")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
-    
-    # Week 8: Add Quiz 3
-    try:
-        grade.add_component_item(
-            component_name="Quizzes",
-            score=18,
-            max_score=20,
-            item_name="Quiz 3",
-            item_date="2024-10-10"
-        )
-        print("✓ Quiz 3 added: 18/20")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
-    
-    # Midterm: Add Prelim Exam
-    try:
-        grade.add_component_item(
-            component_name="Exams",
-            score=85,
-            max_score=100,
-            item_name="Prelim Exam",
-            item_date="2024-09-15"
-        )
-        print("✓ Prelim Exam added: 85/100")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
-    
-    # Add Midterm Exam
-    try:
-        grade.add_component_item(
-            component_name="Exams",
-            score=90,
-            max_score=100,
-            item_name="Midterm Exam",
-            item_date="2024-10-20"
-        )
-        print("✓ Midterm Exam added: 90/100")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
-    
-    # Finals: Add Final Exam
-    try:
-        grade.add_component_item(
-            component_name="Exams",
-            score=88,
-            max_score=100,
-            item_name="Final Exam",
-            item_date="2024-12-10"
-        )
-        print("✓ Final Exam added: 88/100")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
-    
-    # Add Performance Tasks
-    try:
-        grade.add_component_item(
-            component_name="Performance Task",
-            score=40,
-            max_score=50,
-            item_name="Task 1",
-            item_date="2024-10-01"
-        )
-        print("✓ Task 1 added: 40/50")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
-    
-    try:
-        grade.add_component_item(
-            component_name="Performance Task",
-            score=28,
-            max_score=30,
-            item_name="Task 2",
-            item_date="2024-11-05"
-        )
-        print("✓ Task 2 added: 28/30")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
+    grade = Grade.get_or_create(test.id, student.id)
+    
+    # Items recorded over the semester, grouped by component. Each
+    # component is added in one call: all of its items are validated
+    # first and the scores are saved once.
+    semester_items = {
+        "Quizzes": [
+            {"score": 20, "max": 25, "name": "Quiz 1", "date": "2024-09-05"},
+            {"score": 25, "max": 30, "name": "Quiz 2", "date": "2024-09-25"},
+            {"score": 18, "max": 20, "name": "Quiz 3", "date": "2024-10-10"},
+        ],
+        "Exams": [
+            {"score": 85, "max": 100, "name": "Prelim Exam", "date": "2024-09-15"},
+            {"score": 90, "max": 100, "name": "Midterm Exam", "date": "2024-10-20"},
+            {"score": 88, "max": 100, "name": "Final Exam", "date": "2024-12-10"},
+        ],
+        "Performance Task": [
+            {"score": 40, "max": 50, "name": "Task 1", "date": "2024-10-01"},
+            {"score": 28, "max": 30, "name": "Task 2", "date": "2024-11-05"},
+        ],
+        "Project": [
+            {"score": 92, "max": 100, "name": "Final Project", "date": "2024-12-05"},
+        ],
+    }
     
-    # Add Project
-    try:
-        grade.add_component_item(
-            component_name="Project",
-            score=92,
-            max_score=100,
-            item_name="Final Project",
-            item_date="2024-12-05"
-        )
-        print("✓ Final Project added: 92/100")
-    except ValueError as e:
-        print(f"✗ Error: {e}")
+    for component_name, items in semester_items.items():
+        try:
+            added = grade.add_component_items(component_name, items)
+            for item in added:
+                print(f"✓ {item['name']} added: {item['score']:g}/{item['max']:g}")
+        except ValueError as e:
+            print(f"✗ Error ({component_name}): {e}")
     
     # Calculate final grade
     grade.calculate_grade(class_obj)
@@ -167,7 +75,7 @@ def example_view_component_summary():
     """
     View detailed breakdown of each component
     """
-    grade = Grade.query.first()
+    grade = Grade.query_with_class().first()
     
     print("\n=== GRADE BREAKDOWN ===\n")
     
@@ -206,7 +114,7 @@ def example_update_item():
     """
     Teacher corrects a grade entry
     """
-    grade = Grade.query.first()
+    grade = Grade.query_with_class().first()
     
     print("\n=== BEFORE UPDATE ===")
     items = grade.get_component_items("Quizzes")
@@ -246,7 +154,7 @@ def example_delete_item():
     """
     Teacher removes a quiz (e.g., pop quiz that was too hard)
     """
-    grade = Grade.query.first()
+    grade = Grade.query_with_class().first()
     
     print("\n=== BEFORE DELETE ===")
     items = grade.get_component_items("Quizzes")
@@ -315,7 +223,7 @@ def example_validation_tests():
     """
     Test all validation rules
     """
-    grade = Grade.query.first()
+    grade = Grade.query_with_class().first()
     class_obj = grade.test.class_
     
     print("\n=== VALIDATION TESTS ===\n")